@@ -1,40 +1,359 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import polars as pl
+import pyarrow as pa
+import pyarrow.json as pa_json
 
-def fetch_and_clean_df(api_url: str, date_cols=None, time_cols=None, int_cols=None, timedelta_cols=None, drop_cols=None) -> pl.DataFrame:
-    response = requests.get(api_url)
-    response.raise_for_status()
-    data = response.json()
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
-    df = pl.DataFrame(data)
+# urllib3 only decodes brotli bodies when one of the brotli packages is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
 
-    # Clean date columns
-    if date_cols:
-        for col in date_cols:
-            df = df.with_columns(pl.col(col).str.strip_chars('"').str.to_date("%Y-%m-%d"))
 
-    # Clean time columns
-    if time_cols:
-        for col in time_cols:
-            df = df.with_columns(pl.col(col).str.strip_chars('"').str.to_time("%H:%M:%S"))
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
 
-    # Clean timedelta columns (HH:MM:SS -> seconds as integer)
-    if timedelta_cols:
-        for column_name in timedelta_cols:
-            df = df.with_columns(
-                pl.col(column_name).str.extract_all(r"\d+").alias(column_name)
-            ).with_columns(
-                pl.duration(
-                hours=pl.col(column_name).list.get(0).cast(pl.Int64),
-                minutes=pl.col(column_name).list.get(1).cast(pl.Int64),
-                seconds=pl.col(column_name).list.get(2).cast(pl.Int64),
-            ).alias(column_name)
+
+class ApiClient:
+    """Shared HTTP client for the data API.
+
+    Pools connections, retries transient failures with backoff, spaces out
+    requests to at most ``max_requests_per_second``, revalidates cached bodies
+    with ETag/If-None-Match and coalesces identical concurrent GETs into one
+    request. A cached body younger than ``max_age`` seconds is served without
+    any request.
+
+    Only the ETag and fetch time of each URL stay in memory. With
+    ``cache_dir`` bodies are kept on disk, shared between processes, and a
+    file lock per URL makes concurrently starting workers wait for the first
+    one's fetch instead of all hitting the backend. Without it a body is kept
+    in memory until it is ``max_age`` old or ``release``d, so revalidating
+    older responses with If-None-Match needs ``cache_dir``. The dashboards'
+    client from ``get_api_client`` always has one.
+    """
+
+    def __init__(self, timeout=30, retries=3, backoff_factor=0.5, pool_maxsize=10,
+                 max_requests_per_second=None, cache_dir=None, max_age=30):
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.min_interval = 1.0 / max_requests_per_second if max_requests_per_second else 0.0
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+        self._cache = {}  # url -> {"etag", "fetched_at"}
+        self._bodies = {}  # url -> body, only without cache_dir
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, url: str, cache: bool = True) -> bytes:
+        # Single-flight: the first caller for a URL fetches, concurrent callers wait for its result
+        self._drop_expired_bodies()
+        key = (url, cache)
+        with self._lock:
+            call = self._inflight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._inflight[key] = _InFlight()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._fetch(url) if cache else self._fetch_uncached(url)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+        return call.result
+
+    def fetched_at(self, url: str):
+        # When the cached body of url was last fetched or revalidated, i.e. how current it is; None if never fetched
+        with self._lock:
+            entry = self._cache.get(url)
+            return entry["fetched_at"] if entry else None
+
+    def release(self, url: str) -> None:
+        # Drop a body held in memory once the caller has parsed it; the ETag and fetch time are kept
+        with self._lock:
+            self._bodies.pop(url, None)
+
+    def _drop_expired_bodies(self) -> None:
+        now = time.time()
+        with self._lock:
+            for url in [url for url in self._bodies if now - self._cache[url]["fetched_at"] >= self.max_age]:
+                del self._bodies[url]
+
+    def _fetch(self, url: str) -> bytes:
+        if not self.cache_dir:
+            return self._fetch_cached(url)
+        cache_path = os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest())
+        # The disk entry is authoritative, another process may have refreshed it since we last looked
+        with _file_lock(cache_path + ".lock"):
+            return self._fetch_cached(url, cache_path)
+
+    def _fetch_uncached(self, url: str) -> bytes:
+        # For one-off URLs such as change-feed polls, which would only grow the cache
+        self._throttle()
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def _fetch_cached(self, url: str, cache_path: str = None) -> bytes:
+        if cache_path:
+            entry, body = _read_cache_meta(cache_path), None
+        else:
+            with self._lock:
+                body = self._bodies.get(url)
+                entry = self._cache.get(url) if body is not None else None
+
+        def cached_body():
+            return body if body is not None else _read_cache_body(cache_path)
+
+        if entry and time.time() - entry["fetched_at"] < self.max_age:
+            self._remember(url, entry)  # mirrors a disk entry written by another process
+            return cached_body()
+
+        headers = {"If-None-Match": entry["etag"]} if entry and entry["etag"] else {}
+        self._throttle()
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry:
+            self._remember(url, {**entry, "fetched_at": time.time()}, cache_path=cache_path)
+            return cached_body()
+        response.raise_for_status()
+
+        self._remember(url, {"etag": response.headers.get("ETag"), "fetched_at": time.time()}, response.content, cache_path)
+        return response.content
+
+    def _remember(self, url: str, entry: dict, content: bytes = None, cache_path: str = None) -> None:
+        with self._lock:
+            self._cache[url] = entry
+            if content is not None and not self.cache_dir:
+                self._bodies[url] = content
+        if cache_path and content is not None:
+            _write_cache_entry(cache_path, entry, content)
+        elif cache_path:
+            _write_cache_meta(cache_path, entry)
+
+    def _throttle(self):
+        if not self.min_interval:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+@contextmanager
+def _file_lock(lock_path: str):
+    with open(lock_path, "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_cache_meta(cache_path: str):
+    if not (os.path.exists(cache_path + ".json") and os.path.exists(cache_path + ".body")):
+        return None
+    with open(cache_path + ".json") as f:
+        return json.load(f)
+
+
+def _read_cache_body(cache_path: str) -> bytes:
+    with open(cache_path + ".body", "rb") as f:
+        return f.read()
+
+
+def _write_cache_meta(cache_path: str, entry) -> None:
+    with open(cache_path + ".json.tmp", "w") as f:
+        json.dump({"etag": entry["etag"], "fetched_at": entry["fetched_at"]}, f)
+    os.replace(cache_path + ".json.tmp", cache_path + ".json")
+
+
+def _write_cache_entry(cache_path: str, entry, content: bytes) -> None:
+    with open(cache_path + ".body.tmp", "wb") as f:
+        f.write(content)
+    os.replace(cache_path + ".body.tmp", cache_path + ".body")
+    _write_cache_meta(cache_path, entry)
+
+
+_api_client = None
+_api_client_lock = threading.Lock()
+
+
+def get_api_client() -> ApiClient:
+    # One client per process. Bodies are cached on disk, in DASHBOARD_API_CACHE_DIR or else a directory under
+    # the system temp dir, so released payloads are still revalidated with a 304 and workers share one fetch
+    global _api_client
+    with _api_client_lock:
+        if _api_client is None:
+            cache_dir = os.environ.get("DASHBOARD_API_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "dashboard-api-cache")
+            _api_client = ApiClient(cache_dir=cache_dir)
+        return _api_client
+
+
+class SchemaDriftError(ValueError):
+    pass
+
+
+# Wire schemas of the API endpoints; dates and times arrive as strings and are parsed below
+PATIENTS_SCHEMA = {
+    "id": pl.Int64,
+    "patient_id": pl.Int64,
+    "name": pl.String,
+    "sex": pl.String,
+    "dob": pl.String,
+    "insurance": pl.String,
+}
+
+SLOTS_SCHEMA = {
+    "id": pl.Int64,
+    "slot_id": pl.Int64,
+    "appointment_date": pl.String,
+    "appointment_time": pl.String,
+    "is_available": pl.Boolean,
+}
+
+APPOINTMENTS_SCHEMA = {
+    "id": pl.Int64,
+    "appointment_id": pl.Int64,
+    "slot_id": pl.Int64,
+    "scheduling_date": pl.String,
+    "appointment_date": pl.String,
+    "appointment_time": pl.String,
+    "scheduling_interval": pl.Int64,
+    "status": pl.String,
+    "check_in_time": pl.String,
+    "appointment_duration": pl.String,
+    "start_time": pl.String,
+    "end_time": pl.String,
+    "waiting_time": pl.String,
+    "patient_id": pl.Int64,
+    "sex": pl.String,
+    "age": pl.Int64,
+    "age_group": pl.String,
+}
+
+
+ARROW_TYPES = {
+    pl.Int64: pa.int64(),
+    pl.Float64: pa.float64(),
+    pl.String: pa.string(),
+    pl.Boolean: pa.bool_(),
+}
+
+
+def _missing_fields(content: bytes, schema: dict, api_url: str) -> None:
+    # Names the record that lacks a field; only reached when the key count below does not add up
+    records = json.loads(content)
+    for index, record in enumerate(records):
+        if record.keys() != schema.keys():
+            raise SchemaDriftError(
+                f"{api_url} record {index} does not match the declared schema "
+                f"(missing: {sorted(set(schema) - set(record))})"
+            )
+
+
+def read_records(content: bytes, schema: dict, api_url: str = "") -> pl.DataFrame:
+    # Strict decode in Arrow, without Python objects per row: unknown fields, lossy casts (1.5 or true for
+    # an integer, 5 for a string) and missing fields in any record raise instead of being coerced or nulled
+    arrow_schema = pa.schema([("records", pa.list_(pa.struct([(name, ARROW_TYPES[dtype]) for name, dtype in schema.items()])))])
+    wrapped = b'{"records":' + content + b'}'
+    try:
+        table = pa_json.read_json(
+            pa.py_buffer(wrapped),
+            read_options=pa_json.ReadOptions(block_size=len(wrapped) + 1),
+            parse_options=pa_json.ParseOptions(explicit_schema=arrow_schema, unexpected_field_behavior="error", newlines_in_values=True),
         )
+    except pa.ArrowInvalid as error:
+        raise SchemaDriftError(f"{api_url} does not match the declared schema: {error}") from error
+
+    column = table.column("records")
+    if table.num_rows != 1 or column.null_count:
+        raise SchemaDriftError(f"{api_url} is not a JSON array of records")
+    records = column.chunk(0).flatten()
+    if records.null_count:
+        raise SchemaDriftError(f"{api_url} has null records")
+    df = pl.from_arrow(pa.Table.from_struct_array(records))
+
+    # Arrow reads an absent field as null, so only payloads with nulls can lack a field. Unknown and repeated
+    # fields are rejected above, so all fields are present iff the payload holds rows x fields keys, and a
+    # key is the only unescaped '":' in JSON (a quote inside a string is escaped). The count is also off for
+    # a space before the colon, then the records are checked one by one.
+    if any(df.null_count().row(0)):
+        keys = content.count(b'":') - content.count(b'\\":')
+        if keys != df.height * len(schema):
+            _missing_fields(content, schema, api_url)
+    return df
 
-    # Cast integer columns
-    if int_cols:
-        for col in int_cols:
-            df = df.with_columns(pl.col(col).cast(pl.Int64))
+
+def clean_df(df: pl.DataFrame, date_cols=None, time_cols=None, timedelta_cols=None, drop_cols=None) -> pl.DataFrame:
+    # Clean date and time columns
+    df = df.with_columns(
+        [pl.col(col).str.strip_chars('"').str.to_date("%Y-%m-%d") for col in date_cols or []]
+        + [pl.col(col).str.strip_chars('"').str.to_time("%H:%M:%S") for col in time_cols or []]
+    )
+
+    # Clean timedelta columns (HH:MM:SS -> duration)
+    if timedelta_cols:
+        parts = {col: pl.col(col).str.extract_all(r"\d+") for col in timedelta_cols}
+        df = df.with_columns([
+            pl.duration(
+                hours=part.list.get(0).cast(pl.Int64),
+                minutes=part.list.get(1).cast(pl.Int64),
+                seconds=part.list.get(2).cast(pl.Int64),
+            ).alias(col)
+            for col, part in parts.items()
+        ])
 
     # Drop unwanted columns
     if drop_cols:
@@ -43,12 +362,24 @@ def fetch_and_clean_df(api_url: str, date_cols=None, time_cols=None, int_cols=No
     return df
 
 
+def fetch_and_clean_df(api_url: str, schema: dict, date_cols=None, time_cols=None, timedelta_cols=None, drop_cols=None, cache=True) -> pl.DataFrame:
+    df = read_records(get_api_client().get(api_url, cache=cache), schema, api_url)
+    return clean_df(df, date_cols, time_cols, timedelta_cols, drop_cols)
+
+
+APPOINTMENTS_CLEANING = dict(
+    date_cols=["scheduling_date", "appointment_date"],
+    time_cols=["appointment_time", "check_in_time", "start_time", "end_time"],
+    timedelta_cols=["appointment_duration", "waiting_time"],
+    drop_cols=["id"],
+)
+
 
 def get_patients_df(api_url: str) -> pl.DataFrame:
     return fetch_and_clean_df(
         api_url,
+        PATIENTS_SCHEMA,
         date_cols=["dob"],
-        int_cols=["patient_id"],
         drop_cols=["id"]
     )
 
@@ -56,19 +387,17 @@ def get_patients_df(api_url: str) -> pl.DataFrame:
 def get_slots_df(api_url: str) -> pl.DataFrame:
     return fetch_and_clean_df(
         api_url,
+        SLOTS_SCHEMA,
         date_cols=["appointment_date"],
         time_cols=["appointment_time"],
-        int_cols=["slot_id"],
         drop_cols=["id"]
     )
 
 
-def get_appointments_df(api_url: str) -> pl.DataFrame:
-    return fetch_and_clean_df(
-        api_url,
-        date_cols=["scheduling_date", "appointment_date"],
-        time_cols=["appointment_time", "check_in_time", "start_time", "end_time"],
-        timedelta_cols = ["appointment_duration", "waiting_time"],
-        int_cols=["appointment_id", "patient_id"],
-        drop_cols=["id"]
-    )
\ No newline at end of file
+def get_appointments_df(api_url: str, cache: bool = True) -> pl.DataFrame:
+    return fetch_and_clean_df(api_url, APPOINTMENTS_SCHEMA, cache=cache, **APPOINTMENTS_CLEANING)
+
+
+def parse_appointments(content: bytes, source: str = "") -> pl.DataFrame:
+    # Appointment records that did not come from a GET, e.g. a local change log
+    return clean_df(read_records(content, APPOINTMENTS_SCHEMA, source), **APPOINTMENTS_CLEANING)
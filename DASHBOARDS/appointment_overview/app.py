@@ -1,43 +1,117 @@
 import sys
 import os
-import polars as pl
+from datetime import date
 import dash
 from dash import dcc
 from dash import html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from api_requests import get_appointments_df
-from functions_by_filtered_data import calculate_kpis, create_figures
+from deferred_load import DeferredLoad
+from data_tier import create_data_tier, register_report_route
 
 
-def create_dash_app(): 
-    # Get appointment data
-    appointments_url = 'http://localhost:8000/app/appointments/'
-    appointments_df = get_appointments_df(appointments_url)
+def create_dash_app(store_dir=None, fast_start=False, change_feed_interval=None, change_log=None, memory_budget_mb=None, spill_dir=None): 
+    api_url = os.environ.get('DASHBOARD_API_URL', 'http://localhost:8000/app')
 
-    # Made simple wrangling to get the data in the right format
-    grouped_df = appointments_df.group_by(["appointment_date", "status"]).agg(
-        pl.len().alias("count")
-    )
-    ordered_df = grouped_df.sort(["appointment_date", "status"])
-    pd_df = ordered_df.to_pandas()
+    # Callbacks read the aggregates from the tier, which spills the least used entries beyond the memory budget
+    tier = create_data_tier(memory_budget_mb, spill_dir, store_dir)
+
+    def load_data():
+        # Heavy modules (polars, pandas, plotly) are only imported here
+        from api_requests import get_api_client, get_appointments_df, get_patients_df
+        from parquet_store import write_appointments, appointment_date_range
+        from metrics_engine import MetricsEngine
+        from functions_by_filtered_data import count_by_date_status
+
+        # Get appointment data
+        appointments_url = f'{api_url}/appointments/'
+        appointments_df = get_appointments_df(appointments_url)
+        patients_url = f'{api_url}/patients'
+        patients_insurance_df = get_patients_df(patients_url).select(["patient_id", "insurance"])
+
+        # Only the parsed frames are kept, drop the raw payloads from the shared API client
+        get_api_client().release(appointments_url)
+        get_api_client().release(patients_url)
+
+        # Quantile sketches of waiting time, duration and arrival offset per day and insurance
+        metrics_engine = MetricsEngine()
+        metrics_engine.add(appointments_df.join(patients_insurance_df, on="patient_id", how="left"))
+        insurances = patients_insurance_df["insurance"].drop_nulls().unique().sort().to_list()
+
+        # Out-of-core mode: persist year/month partitions and answer each date range from the overlapping ones only
+        if store_dir:
+            write_appointments(appointments_df, store_dir)
+            del appointments_df
+            pd_df = None
+            min_date, max_date = appointment_date_range(store_dir)
+        else:
+            # Made simple wrangling to get the data in the right format
+            pd_df = count_by_date_status(appointments_df.lazy())
+            min_date = pd_df['appointment_date'].min().date()
+            max_date = pd_df['appointment_date'].max().date()
+
+        tier.put('metrics_engine', metrics_engine)
+        if pd_df is not None:
+            tier.put('pd_df', pd_df)
+        loaded = {
+            'min_date': min_date,
+            'max_date': max_date,
+            'insurances': insurances,
+            'version': 0,
+        }
+
+        # Change feed: keep the date x status counts up to date from appointment changes instead of reloading
+        if change_feed_interval and not store_dir:
+            from incremental_aggregates import IncrementalAggregates, ApiChangeFeed, ChangeLogFeed, start_polling
+            from functions_by_filtered_data import date_status_counts_to_pandas
+
+            # The per-appointment keys are only needed between polls, so they live in the tier too
+            aggregates = IncrementalAggregates({"date_status": ["appointment_date", "status"]})
+            aggregates.load(appointments_df)
+            tier.put('aggregates', aggregates)
+            del aggregates
+
+            def apply_changes(upserts, deleted_ids):
+                aggregates = tier.get('aggregates')
+                aggregates.apply(upserts, deleted_ids)
+                tier.put('aggregates', aggregates)
+                tier.put('pd_df', date_status_counts_to_pandas(aggregates.get("date_status")))
+                loaded['version'] = aggregates.version
+
+            # Deletes only arrive through the change log, the API feed reports inserts and updates
+            feed = ChangeLogFeed(change_log) if change_log else ApiChangeFeed(appointments_url)
+            start_polling(feed, apply_changes, change_feed_interval)
+
+        # The payloads were released above and nothing else references the raw frames, so they are freed on return
+        return loaded
+
+    # Fast-start mode: serve the layout right away and load the data in the background
+    data = DeferredLoad(load_data)
+    if fast_start:
+        data.start()
+    else:
+        data.run()
 
     # Initialize Dash app
     app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    register_report_route(app.server, tier)
 
     # App layout
     app.layout = html.Div([
         dbc.Row([
-            dbc.Col(html.H1("Appointment Analysis Dashboard"), width=12)
+            dbc.Col(html.H1("Appointment Analysis Dashboard"), width=12),
+            dbc.Col(html.Div("Loading appointment data...", id='data-status'), width=12),
+            dcc.Interval(id='data-poll', interval=500),
+            dcc.Interval(id='refresh-poll', interval=(change_feed_interval or 1) * 1000, disabled=not change_feed_interval),
+            dcc.Store(id='data-version', data=0)
         ], style={'padding': '20px'}),
         
         # Date Picker Range to filter data
         dbc.Row([
             dbc.Col(dcc.DatePickerRange(
                 id='date-picker-range',
-                start_date=pd_df['appointment_date'].min().date(),
-                end_date=pd_df['appointment_date'].max().date(),
                 display_format='YYYY-MM-DD',
                 style={'width': '100%'}
             ), width=12)
@@ -78,9 +152,51 @@ def create_dash_app():
         dbc.Row([
             dbc.Col(dcc.Graph(id='line-plot'), width=8, style={'padding': '10px'}),
             dbc.Col(dcc.Graph(id='pie-plot'), width=4, style={'padding': '10px'})
+        ], style={'padding': '20px'}),
+
+        # Operational metrics (p50/p90/p99) for the date range and selected insurances
+        dbc.Row([
+            dbc.Col(html.H4("Operational Metrics (minutes)"), width=12),
+            dbc.Col(dcc.Dropdown(
+                id='metrics-insurance-filter',
+                options=[],
+                multi=True,
+                placeholder="All insurance plans",
+            ), width=12, style={'padding': '10px'}),
+            dbc.Col(html.Div(id='operational-metrics'), width=12)
         ], style={'padding': '20px'})
     ])
 
+    # Callback to fill in the date range and filters once the data has been loaded
+    @app.callback(
+        [Output('date-picker-range', 'start_date'),
+        Output('date-picker-range', 'end_date'),
+        Output('metrics-insurance-filter', 'options'),
+        Output('data-status', 'children'),
+        Output('data-poll', 'disabled')],
+        [Input('data-poll', 'n_intervals')]
+    )
+    def show_loaded_data(n_intervals):
+        if not data.ready():
+            raise PreventUpdate
+        if data.failed():
+            return None, None, [], "Failed to load appointment data", True
+
+        loaded = data.get()
+        options = [{'label': i, 'value': i} for i in loaded['insurances']]
+        return loaded['min_date'], loaded['max_date'], options, "", True
+
+    # Callback to redraw when the change feed has updated the aggregates
+    @app.callback(
+        Output('data-version', 'data'),
+        [Input('refresh-poll', 'n_intervals')],
+        [State('data-version', 'data')]
+    )
+    def check_data_version(n_intervals, current_version):
+        if not data.ready() or data.failed() or data.get()['version'] == current_version:
+            raise PreventUpdate
+        return data.get()['version']
+
     # Callback to update the graphs and KPIs based on the date range filter
     @app.callback(
         [Output('total-appointments', 'children'),
@@ -90,12 +206,24 @@ def create_dash_app():
         Output('line-plot', 'figure'),
         Output('pie-plot', 'figure')],
         [Input('date-picker-range', 'start_date'),
-        Input('date-picker-range', 'end_date')]
+        Input('date-picker-range', 'end_date'),
+        Input('data-version', 'data')]
     )
 
-    def update_dashboard(start_date, end_date):
+    def update_dashboard(start_date, end_date, data_version):
+        if start_date is None or end_date is None or not data.ready():
+            raise PreventUpdate
+        from parquet_store import scan_appointments_between
+        from functions_by_filtered_data import calculate_kpis, create_figures, count_by_date_status
+
         # Filter data based on selected date range
-        filtered_df = pd_df[(pd_df['appointment_date'] >= start_date) & (pd_df['appointment_date'] <= end_date)]
+        if store_dir:
+            filtered_df = count_by_date_status(scan_appointments_between(
+                store_dir, date.fromisoformat(start_date[:10]), date.fromisoformat(end_date[:10])
+            ))
+        else:
+            pd_df = tier.get('pd_df')
+            filtered_df = pd_df[(pd_df['appointment_date'] >= start_date) & (pd_df['appointment_date'] <= end_date)]
         
         # Calculate KPIs
         total_appointments, completed_appointments, cancellations, no_show = calculate_kpis(filtered_df)
@@ -105,6 +233,23 @@ def create_dash_app():
         
         # Return updated KPIs and figures
         return total_appointments, completed_appointments, cancellations, no_show, fig_line, fig_pie
+
+    # Callback to answer the percentiles by merging the sketches of the selected days and insurances
+    @app.callback(
+        Output('operational-metrics', 'children'),
+        [Input('date-picker-range', 'start_date'),
+        Input('date-picker-range', 'end_date'),
+        Input('metrics-insurance-filter', 'value')]
+    )
+    def update_operational_metrics(start_date, end_date, selected_insurances):
+        if start_date is None or end_date is None or not data.ready():
+            raise PreventUpdate
+        from functions_by_filtered_data import create_metrics_table
+
+        metrics_df = tier.get('metrics_engine').quantiles(
+            date.fromisoformat(start_date[:10]), date.fromisoformat(end_date[:10]), selected_insurances
+        )
+        return create_metrics_table(metrics_df)
     
 
     return app
@@ -1,5 +1,19 @@
 import pandas as pd
+import polars as pl
 import plotly.express as px
+import dash_bootstrap_components as dbc
+from parquet_store import collect_streaming
+
+def count_by_date_status(appointments_lf):
+    grouped_lf = appointments_lf.group_by(["appointment_date", "status"]).agg(
+        pl.len().alias("count")
+    )
+    ordered_df = collect_streaming(grouped_lf.sort(["appointment_date", "status"]))
+    return ordered_df.to_pandas()
+
+def date_status_counts_to_pandas(counts_df):
+    # Counts maintained elsewhere (e.g. from a change feed), in the same shape as count_by_date_status
+    return counts_df.sort(["appointment_date", "status"]).to_pandas()
 
 def calculate_kpis(filtered_df):
     total_appointments = filtered_df['count'].sum()
@@ -12,4 +26,16 @@ def calculate_kpis(filtered_df):
 def create_figures(filtered_df):
     fig_line = px.line(filtered_df, x='appointment_date', y='count', color='status', title='Appointments Over Time by Status')
     fig_pie = px.pie(filtered_df, names='status', values='count', title='Appointment Status Distribution')
-    return fig_line, fig_pie
\ No newline at end of file
+    return fig_line, fig_pie
+
+METRIC_LABELS = {
+    'waiting_time': 'Waiting time',
+    'arrival_offset': 'Arrival offset (check-in - appointment time)',
+    'appointment_duration': 'Appointment duration',
+}
+
+def create_metrics_table(metrics_df):
+    table_df = metrics_df.to_pandas()
+    table_df['measure'] = table_df['measure'].map(METRIC_LABELS)
+    table_df = table_df.rename(columns={'measure': 'Measure', 'count': 'Appointments'}).round(1)
+    return dbc.Table.from_dataframe(table_df, striped=True, bordered=True, size='sm')
@@ -0,0 +1,93 @@
+import numpy as np
+import polars as pl
+from parquet_store import collect_streaming
+
+# Cube dimensions and how each is derived from the merged appointments frame. Age (years) and duration
+# (minutes) are kept at the resolution the charts plot, bands are applied as ranges when filtering. There is
+# no date dimension, so the number of cells is bounded by the product of the level counts, not by the rows.
+DIMENSIONS = {
+    "status": pl.col("status"),
+    "insurance": pl.col("insurance"),
+    "age": pl.col("age"),
+    "sex": pl.col("sex"),
+    "duration_minutes": pl.col("appointment_duration").dt.total_minutes(),
+}
+
+
+def dimension_keys() -> list:
+    return [expr.alias(name) for name, expr in DIMENSIONS.items()]
+
+
+class CountCube:
+    """Appointment counts over (status, insurance, age, sex, duration in minutes).
+
+    Only non-empty cells are stored, as one row of dimension codes plus a
+    count, so the cube is bounded by the number of distinct combinations
+    rather than by the number of appointments. Any combination of filters is
+    answered by masking cells and summing counts with ``np.bincount``.
+    """
+
+    def __init__(self, levels: dict, codes: np.ndarray, counts: np.ndarray, dtypes: dict):
+        self.levels = levels
+        self.dtypes = dtypes
+        self.dimensions = list(levels)
+        self.codes = codes
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, df) -> "CountCube":
+        return cls.from_cells(collect_streaming(
+            df.lazy().group_by(dimension_keys()).agg(pl.len().alias("count"))
+        ))
+
+    @classmethod
+    def from_cells(cls, cells: pl.DataFrame) -> "CountCube":
+        # cells: one row per non-empty combination of DIMENSIONS with its count
+        levels, codes = {}, []
+        for name in DIMENSIONS:
+            column = cells[name]
+            values = column.drop_nulls().unique().sort()
+            lookup = pl.DataFrame({name: values, "code": np.arange(len(values), dtype=np.int32)})
+            # Nulls get the last code
+            level_codes = column.to_frame().join(lookup, on=name, how="left")["code"].fill_null(len(values))
+            levels[name] = values.to_list() + [None]
+            codes.append(level_codes.to_numpy().astype(np.int32))
+        dtypes = {name: cells.schema[name] for name in DIMENSIONS}
+        return cls(levels, np.column_stack(codes), cells["count"].to_numpy().astype(np.int64), dtypes)
+
+    def _allowed(self, name: str, condition) -> np.ndarray:
+        # A list keeps the listed values, a (low, high) tuple keeps the inclusive range
+        levels = self.levels[name]
+        if isinstance(condition, tuple):
+            low, high = condition
+            return np.array([value is not None and low <= value <= high for value in levels])
+        return np.array([value in condition for value in levels])
+
+    def mask(self, filters: dict) -> np.ndarray:
+        mask = np.ones(len(self.counts), dtype=bool)
+        for name, condition in (filters or {}).items():
+            if condition is None:
+                continue
+            mask &= self._allowed(name, condition)[self.codes[:, self.dimensions.index(name)]]
+        return mask
+
+    def count_by(self, dimensions: list, filters: dict = None) -> pl.DataFrame:
+        axes = [self.dimensions.index(name) for name in dimensions]
+        sizes = [len(self.levels[name]) for name in dimensions]
+        mask = self.mask(filters)
+
+        linear = np.ravel_multi_index(tuple(self.codes[mask][:, axis] for axis in axes), sizes) \
+            if mask.any() else np.zeros(0, dtype=np.int64)
+        totals = np.bincount(linear, weights=self.counts[mask], minlength=int(np.prod(sizes)))
+        cells = np.nonzero(totals)[0]
+        cell_codes = np.unravel_index(cells, sizes)
+
+        # Typed from the cells, a slice where a dimension is all null (e.g. durations of missed appointments)
+        # would otherwise come back as a Null column
+        return pl.DataFrame({
+            **{
+                name: pl.Series(name, [self.levels[name][code] for code in cell_codes[i]], dtype=self.dtypes[name])
+                for i, name in enumerate(dimensions)
+            },
+            "count": totals[cells].astype(np.int64),
+        })
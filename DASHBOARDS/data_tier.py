@@ -0,0 +1,177 @@
+import os
+import json
+import uuid
+import pickle
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules are imported where they are used, so dashboards can create the tier before loading data
+
+
+def estimated_size(value) -> int:
+    # Bytes held by frames and arrays, looking through plain containers and object attributes
+    import numpy as np
+    import pandas as pd
+    import polars as pl
+
+    if isinstance(value, (pl.DataFrame, pl.Series)):
+        return value.estimated_size()
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(estimated_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimated_size(item) for item in value)
+    if hasattr(value, "__dict__"):
+        return estimated_size(vars(value))
+    return 0
+
+
+def _write_spill(value, path_base: str) -> str:
+    # Frames go to parquet, anything else (count cube, sketch engine) is pickled
+    import pandas as pd
+    import polars as pl
+
+    if isinstance(value, pl.DataFrame):
+        path = path_base + ".parquet"
+        value.write_parquet(path)
+    elif isinstance(value, pd.DataFrame):
+        path = path_base + ".pandas.parquet"
+        value.to_parquet(path)
+    else:
+        path = path_base + ".pickle"
+        with open(path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_spill(path: str):
+    import pandas as pd
+    import polars as pl
+
+    if path.endswith(".pandas.parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".parquet"):
+        return pl.read_parquet(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class DataTier:
+    """The derived data a dashboard's callbacks read, kept within a memory budget.
+
+    Entries are put once they are built and read back with ``get``. When the
+    estimated size of the resident entries exceeds ``budget_bytes``, the
+    least recently used ones are written to ``spill_dir`` and dropped from
+    memory; the next ``get`` reads them back. An entry that is read again
+    without having been replaced is not rewritten on its next eviction.
+    Raw frames are not meant to be put here, they should be released as soon
+    as the aggregates are built.
+    """
+
+    def __init__(self, budget_bytes: int = None, spill_dir: str = None):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self._resident = OrderedDict()  # name -> value, least recently used first
+        self._sizes = {}
+        self._spilled = {}  # name -> spill file, valid until the entry is replaced
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def _spill_path_base(self, name: str) -> str:
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="dashboard-spill-")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        return os.path.join(self.spill_dir, f"{name}-{uuid.uuid4().hex}")
+
+    def _remove_spill(self, name: str) -> None:
+        path = self._spilled.pop(name, None)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def put(self, name: str, value) -> None:
+        with self._lock:
+            self._remove_spill(name)
+            self._resident[name] = value
+            self._resident.move_to_end(name)
+            self._sizes[name] = estimated_size(value)
+            self._stats.setdefault(name, {"hits": 0, "loads": 0, "evictions": 0})
+            if self.budget_bytes is not None and self._sizes[name] > self.budget_bytes:
+                logger.warning("data tier entry %r alone exceeds the memory budget (%d > %d bytes)",
+                               name, self._sizes[name], self.budget_bytes)
+            self._evict(keep=name)
+
+    def get(self, name: str):
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                self._stats[name]["hits"] += 1
+                return self._resident[name]
+            if name not in self._spilled:
+                raise KeyError(name)
+
+            value = _read_spill(self._spilled[name])
+            self._resident[name] = value
+            self._stats[name]["loads"] += 1
+            self._evict(keep=name)
+            return value
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._resident or name in self._spilled
+
+    def resident_bytes(self) -> int:
+        return sum(self._sizes[name] for name in self._resident)
+
+    def _evict(self, keep: str) -> None:
+        # The entry being put or read stays resident even if it alone exceeds the budget
+        if self.budget_bytes is None:
+            return
+        for name in list(self._resident):
+            if self.resident_bytes() <= self.budget_bytes:
+                break
+            if name == keep:
+                continue
+            if name not in self._spilled:
+                self._spilled[name] = _write_spill(self._resident[name], self._spill_path_base(name))
+            del self._resident[name]
+            self._stats[name]["evictions"] += 1
+
+    def report(self) -> dict:
+        # Process RSS next to the budget, plus per-entry sizes and residency
+        import psutil
+
+        with self._lock:
+            return {
+                "rss_bytes": psutil.Process().memory_info().rss,
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": self.resident_bytes(),
+                "entries": {
+                    name: {
+                        "bytes": self._sizes[name],
+                        "resident": name in self._resident,
+                        **self._stats[name],
+                    }
+                    for name in self._sizes
+                },
+            }
+
+
+def create_data_tier(memory_budget_mb=None, spill_dir=None, store_dir=None) -> DataTier:
+    # Spill next to the parquet store when there is one, otherwise to a temporary directory
+    if spill_dir is None and store_dir:
+        spill_dir = os.path.join(store_dir, "spill")
+    budget_bytes = int(memory_budget_mb * 2**20) if memory_budget_mb else None
+    return DataTier(budget_bytes, spill_dir)
+
+
+def register_report_route(server, tier: DataTier) -> None:
+    # GET /_data-tier answers the tier report as JSON, for packing dashboards per host
+    @server.route("/_data-tier")
+    def data_tier_report():
+        return server.response_class(json.dumps(tier.report()), mimetype="application/json")
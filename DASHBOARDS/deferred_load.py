@@ -0,0 +1,48 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredLoad:
+    """Runs a dashboard's data loader either inline or on a background thread.
+
+    Callbacks check ``ready()`` and read the loader's result with ``get()``;
+    an exception raised by the loader is re-raised by ``get()``.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._result = None
+        self._error = None
+        self._done = threading.Event()
+
+    def _run(self):
+        try:
+            self._result = self._loader()
+        except Exception as error:
+            # In fast-start mode nothing else reports it, callbacks only see that the load failed
+            logger.exception("dashboard data load failed")
+            self._error = error
+        finally:
+            self._done.set()
+
+    def run(self):
+        self._run()
+        return self.get()
+
+    def start(self):
+        threading.Thread(target=self._run, name="dashboard-data-load", daemon=True).start()
+        return self
+
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def failed(self) -> bool:
+        return self._done.is_set() and self._error is not None
+
+    def get(self, timeout=None):
+        self._done.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return self._result
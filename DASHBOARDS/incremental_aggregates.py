@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+import polars as pl
+from api_requests import SchemaDriftError, get_api_client, get_appointments_df, parse_appointments
+
+logger = logging.getLogger(__name__)
+
+# The dashboards' group-bys; a key is a column name or an aliased expression over the appointments frame
+AGGREGATES = {
+    "date_status": ["appointment_date", "status"],
+    "status_insurance": ["status", "insurance"],
+    "age_insurance": ["age", "insurance"],
+    "duration_insurance": ["appointment_duration", "insurance"],
+}
+
+
+def _key_name(key) -> str:
+    return key if isinstance(key, str) else key.meta.output_name()
+
+
+class IncrementalAggregates:
+    """Count aggregates maintained from appointment inserts, updates and deletes.
+
+    Alongside the counts it keeps, per appointment_id, the key values the
+    appointment was last counted under. An update therefore decrements the
+    cell of the old status (or date, insurance...) and increments the new
+    one, and re-applying the same change is a no-op.
+    """
+
+    def __init__(self, aggregates=None):
+        self.aggregates = aggregates or AGGREGATES
+        self.counts = {}
+        self.rows = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Picklable so the data tier can spill it; the lock is recreated on load
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _keys(self, df: pl.DataFrame) -> pl.DataFrame:
+        # appointment_id plus every key the aggregates group by, computed once per row
+        exprs = {}
+        for keys in self.aggregates.values():
+            for key in keys:
+                exprs[_key_name(key)] = pl.col(key) if isinstance(key, str) else key
+        return df.select(pl.col("appointment_id"), *exprs.values())
+
+    def _group_counts(self, rows: pl.DataFrame, name: str, sign: int) -> pl.DataFrame:
+        keys = [_key_name(key) for key in self.aggregates[name]]
+        return rows.group_by(keys).agg((pl.len().cast(pl.Int64) * sign).alias("count"))
+
+    def load(self, appointments_df: pl.DataFrame) -> None:
+        rows = self._keys(appointments_df.unique("appointment_id", keep="last"))
+        with self._lock:
+            self.rows = rows
+            self.counts = {name: self._group_counts(rows, name, 1) for name in self.aggregates}
+            self.version += 1
+
+    def apply(self, upserts: pl.DataFrame = None, deleted_ids=None) -> None:
+        new_rows = self._keys(upserts.unique("appointment_id", keep="last")) if upserts is not None and upserts.height else None
+        touched = pl.concat([
+            new_rows["appointment_id"] if new_rows is not None else pl.Series("appointment_id", [], pl.Int64),
+            pl.Series("appointment_id", list(deleted_ids or []), pl.Int64),
+        ])
+        if touched.is_empty():
+            return
+
+        with self._lock:
+            old_rows = self.rows.filter(pl.col("appointment_id").is_in(touched))
+            for name in self.aggregates:
+                deltas = [self.counts[name], self._group_counts(old_rows, name, -1)]
+                if new_rows is not None:
+                    deltas.append(self._group_counts(new_rows, name, 1))
+                keys = [_key_name(key) for key in self.aggregates[name]]
+                self.counts[name] = pl.concat(deltas).group_by(keys).agg(
+                    pl.col("count").sum()
+                ).filter(pl.col("count") != 0)
+
+            remaining = self.rows.filter(~pl.col("appointment_id").is_in(touched))
+            self.rows = pl.concat([remaining, new_rows]) if new_rows is not None else remaining
+            self.version += 1
+
+    def get(self, name: str) -> pl.DataFrame:
+        with self._lock:
+            return self.counts[name]
+
+
+class ApiChangeFeed:
+    """Polls the appointments endpoint for records changed since the previous poll.
+
+    The first poll asks for changes since the snapshot the aggregates were
+    loaded from was fetched (or last revalidated), which may be older than
+    the feed when the client served it from its cache. Each poll asks for
+    ``updated_since`` a little before the last poll started; the overlap is
+    harmless because applying an upsert twice changes nothing.
+
+    The endpoint only returns records that still exist, so this feed never
+    reports deletes; deployments that delete appointments need the
+    ``ChangeLogFeed`` (or a periodic reload) to drop them.
+    """
+
+    def __init__(self, appointments_url: str, since: datetime = None, overlap_seconds: float = 5):
+        self.appointments_url = appointments_url
+        if since is None:
+            fetched_at = get_api_client().fetched_at(appointments_url)
+            since = datetime.fromtimestamp(fetched_at, timezone.utc) if fetched_at else datetime.now(timezone.utc)
+        self.since = since
+        self.overlap = timedelta(seconds=overlap_seconds)
+
+    def poll(self):
+        started = datetime.now(timezone.utc)
+        separator = "&" if "?" in self.appointments_url else "?"
+        # Encoded, a literal '+' of the UTC offset would reach the server as a space
+        url = f"{self.appointments_url}{separator}{urlencode({'updated_since': (self.since - self.overlap).isoformat()})}"
+        upserts = get_appointments_df(url, cache=False)
+        self.since = started
+        return upserts, []
+
+
+class ChangeLogFeed:
+    """Reads new lines of a local JSON-lines change log.
+
+    Each line is ``{"op": "insert" | "update", "record": {...}}`` with an
+    appointments record as served by the API, or
+    ``{"op": "delete", "appointment_id": 123}``. A malformed line or a
+    record that does not match the appointments schema is logged and
+    skipped; the rest of the poll is still applied.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+
+    def poll(self):
+        if not os.path.exists(self.path):
+            return None, []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            lines = f.readlines()
+        # A trailing line without newline is still being written, pick it up on the next poll
+        if lines and not lines[-1].endswith(b"\n"):
+            lines = lines[:-1]
+
+        # Only the last change per appointment counts, so an update followed by a delete stays deleted
+        changes = {}
+        offset = self.offset
+        for line in lines:
+            line_offset, offset = offset, offset + len(line)
+            if not line.strip():
+                continue
+            try:
+                change = json.loads(line)
+                if change["op"] == "delete":
+                    changes[int(change["appointment_id"])] = None
+                else:
+                    changes[int(change["record"]["appointment_id"])] = change["record"]
+            except (ValueError, KeyError, TypeError) as error:
+                logger.warning("skipping malformed change at byte %d of %s: %r", line_offset, self.path, error)
+
+        records = [record for record in changes.values() if record is not None]
+        deleted_ids = [appointment_id for appointment_id, record in changes.items() if record is None]
+        upserts = self._parse(records) if records else None
+        # Advance only once the whole batch has been read and parsed
+        self.offset = offset
+        return upserts, deleted_ids
+
+    def _parse(self, records):
+        try:
+            return parse_appointments(json.dumps(records).encode(), self.path)
+        except (SchemaDriftError, pl.exceptions.PolarsError):
+            pass
+        # Some record does not parse: skip the bad ones instead of losing the whole batch
+        valid = []
+        for record in records:
+            try:
+                parse_appointments(json.dumps([record]).encode(), self.path)
+                valid.append(record)
+            except (SchemaDriftError, pl.exceptions.PolarsError) as error:
+                logger.warning("skipping change of appointment %s in %s: %s", record.get("appointment_id"), self.path, error)
+        return parse_appointments(json.dumps(valid).encode(), self.path) if valid else None
+
+
+def start_polling(feed, apply, interval: float) -> threading.Thread:
+    # Background loop feeding each poll's (upserts, deleted_ids) to ``apply``
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                upserts, deleted_ids = feed.poll()
+                if (upserts is not None and upserts.height) or deleted_ids:
+                    apply(upserts, deleted_ids)
+            except Exception:
+                logger.exception("change feed poll failed")
+
+    thread = threading.Thread(target=run, name="appointments-change-feed", daemon=True)
+    thread.start()
+    return thread
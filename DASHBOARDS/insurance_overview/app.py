@@ -1,64 +1,208 @@
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
-import plotly.express as px
-import polars as pl
-import pandas as pd
+from dash import dcc, html, ctx
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from api_requests import get_appointments_df, get_patients_df
-from functions_by_filtered_data import create_figures
+from deferred_load import DeferredLoad
+from data_tier import create_data_tier, register_report_route
 
 
-def create_dash_app():
+def create_dash_app(store_dir=None, fast_start=False, change_feed_interval=None, change_log=None, memory_budget_mb=None, spill_dir=None):
+    api_url = os.environ.get('DASHBOARD_API_URL', 'http://localhost:8000/app')
 
-    # Get appointment and patient data
-    appointments_url = 'http://localhost:8000/app/appointments/'
-    appointments_df = get_appointments_df(appointments_url)
-    patients_url = 'http://localhost:8000/app/patients'
-    patients_df = get_patients_df(patients_url)
+    # Callbacks read the cube from the tier, which spills the least used entries beyond the memory budget
+    tier = create_data_tier(memory_budget_mb, spill_dir, store_dir)
 
-    # Made simple wrangling to get the data in the right format
-    df_merged = appointments_df.join(patients_df.select(["patient_id", "insurance"]), on="patient_id", how="left")
-    df_merged = df_merged[["sex", "age", "insurance", "patient_id", "status", "appointment_duration"]]
+    def load_data():
+        # Heavy modules (polars, pandas, plotly) are only imported here
+        import polars as pl
+        from api_requests import get_api_client, get_appointments_df, get_patients_df
+        from parquet_store import collect_streaming
+        from join_cache import refresh_appointments_patients, scan_appointments_patients
+        from count_cube import CountCube
+
+        # Get appointment and patient data
+        appointments_url = f'{api_url}/appointments/'
+        appointments_df = get_appointments_df(appointments_url)
+        patients_url = f'{api_url}/patients'
+        patients_df = get_patients_df(patients_url)
+
+        # Only the parsed frames are kept, drop the raw payloads from the shared API client
+        get_api_client().release(appointments_url)
+        get_api_client().release(patients_url)
+
+        # Out-of-core mode: bring the persisted appointments x patients table up to date and scan it lazily
+        if store_dir:
+            refresh_appointments_patients(appointments_df, patients_df, store_dir)
+            del appointments_df, patients_df
+            df_merged = scan_appointments_patients(store_dir)
+        else:
+            df_merged = appointments_df.join(patients_df.select(["patient_id", "insurance"]), on="patient_id", how="left")
+
+        # Made simple wrangling to get the data in the right format
+        df_merged = df_merged.select(["sex", "age", "insurance", "patient_id", "status", "appointment_duration", "appointment_date", "appointment_id"])
+        insurances = collect_streaming(df_merged.lazy().select(pl.col("insurance").unique()))
+
+        # Shared count cube that answers every combination of filters without touching the rows again
+        cube = CountCube.from_frame(df_merged)
+
+        tier.put('cube', cube)
+        loaded = {
+            'insurances': insurances['insurance'].to_list(),
+            'version': 0,
+        }
+
+        # Change feed: maintain the cube's cell counts from appointment changes instead of reloading
+        if change_feed_interval and not store_dir:
+            from incremental_aggregates import IncrementalAggregates, ApiChangeFeed, ChangeLogFeed, start_polling
+            from count_cube import dimension_keys
+
+            patients_insurance_df = patients_df.select(["patient_id", "insurance"])
+
+            # The per-appointment keys are only needed between polls, so they live in the tier too
+            aggregates = IncrementalAggregates({"cube": dimension_keys()})
+            aggregates.load(df_merged)
+            tier.put('aggregates', aggregates)
+            del aggregates
+
+            def apply_changes(upserts, deleted_ids):
+                if upserts is not None:
+                    upserts = upserts.join(patients_insurance_df, on="patient_id", how="left")
+                aggregates = tier.get('aggregates')
+                aggregates.apply(upserts, deleted_ids)
+                tier.put('aggregates', aggregates)
+                tier.put('cube', CountCube.from_cells(aggregates.get("cube")))
+                loaded['version'] = aggregates.version
+
+            # Deletes only arrive through the change log, the API feed reports inserts and updates
+            feed = ChangeLogFeed(change_log) if change_log else ApiChangeFeed(appointments_url)
+            start_polling(feed, apply_changes, change_feed_interval)
+
+        # The payloads were released above and nothing else references the raw frames, so they are freed on return
+        return loaded
+
+    # Fast-start mode: serve the layout right away and load the data in the background
+    data = DeferredLoad(load_data)
+    if fast_start:
+        data.start()
+    else:
+        data.run()
 
     # Initialize Dash app
     app = dash.Dash(__name__)
+    register_report_route(app.server, tier)
 
     # App layout
     app.layout = html.Div([
         html.H1("Medical Appointments Dashboard"),
+        html.Div("Loading appointment data...", id='data-status'),
+        dcc.Interval(id='data-poll', interval=500),
+        dcc.Store(id='data-loaded'),
+        dcc.Interval(id='refresh-poll', interval=(change_feed_interval or 1) * 1000, disabled=not change_feed_interval),
+        dcc.Store(id='data-version', data=0),
 
         # Dropdown para filtrar por insurance
         dcc.Dropdown(
             id='insurance-filter',
-            options=[{'label': i, 'value': i} for i in df_merged['insurance'].unique().to_list()],
+            options=[],
             multi=True,
             placeholder="Select Insurance Plans",
         ),
 
+        # Cross-filters set by clicking a bar (status), a line point (age band) or a scatter point (duration)
+        dcc.Store(id='cross-filters', data={}),
+        html.Div([
+            html.Span(id='cross-filter-status'),
+            html.Button("Clear chart filters", id='clear-cross-filters', n_clicks=0),
+        ]),
+
         dcc.Graph(id='bar-chart'),
         dcc.Graph(id='line-chart'),
         dcc.Graph(id='scatter-chart'),
     ])
 
+    # Callback to fill in the filter options once the data has been loaded
+    @app.callback(
+        [Output('insurance-filter', 'options'),
+        Output('data-loaded', 'data'),
+        Output('data-status', 'children'),
+        Output('data-poll', 'disabled')],
+        [Input('data-poll', 'n_intervals')]
+    )
+    def show_loaded_data(n_intervals):
+        if not data.ready():
+            raise PreventUpdate
+        if data.failed():
+            return [], False, "Failed to load appointment data", True
+
+        options = [{'label': i, 'value': i} for i in data.get()['insurances']]
+        return options, True, "", True
+
+    # Callback to redraw when the change feed has updated the cube
+    @app.callback(
+        Output('data-version', 'data'),
+        [Input('refresh-poll', 'n_intervals')],
+        [State('data-version', 'data')]
+    )
+    def check_data_version(n_intervals, current_version):
+        if not data.ready() or data.failed() or data.get()['version'] == current_version:
+            raise PreventUpdate
+        return data.get()['version']
+
+    # Callback to toggle a cross-filter from a chart click
+    @app.callback(
+        [Output('cross-filters', 'data'),
+        Output('cross-filter-status', 'children')],
+        [Input('bar-chart', 'clickData'),
+        Input('line-chart', 'clickData'),
+        Input('scatter-chart', 'clickData'),
+        Input('clear-cross-filters', 'n_clicks')],
+        [State('cross-filters', 'data')]
+    )
+    def update_cross_filters(bar_click, line_click, scatter_click, n_clicks, cross_filters):
+        from functions_by_filtered_data import cross_filter_from_click
+
+        if ctx.triggered_id == 'clear-cross-filters':
+            cross_filters = {}
+        else:
+            click = {'bar-chart': bar_click, 'line-chart': line_click, 'scatter-chart': scatter_click}.get(ctx.triggered_id)
+            if not click:
+                raise PreventUpdate
+            name, value = cross_filter_from_click(ctx.triggered_id, click['points'][0])
+            cross_filters = dict(cross_filters or {})
+            if cross_filters.get(name) == value:
+                cross_filters.pop(name)
+            else:
+                cross_filters[name] = value
+
+        labels = {'status': 'status', 'age': 'age', 'duration_minutes': 'duration (min)'}
+        status = ", ".join(
+            f"{labels[name]}: {value[0]}" if name == 'status' else f"{labels[name]}: {value[0]}-{value[1]}"
+            for name, value in cross_filters.items()
+        )
+        return cross_filters, f"Chart filters: {status} " if status else ""
+
     # Callback to update the charts based on the selected insurance
     @app.callback(
         [Output('bar-chart', 'figure'),
         Output('line-chart', 'figure'),
         Output('scatter-chart', 'figure')],
-        [Input('insurance-filter', 'value')]
+        [Input('insurance-filter', 'value'),
+        Input('data-loaded', 'data'),
+        Input('cross-filters', 'data'),
+        Input('data-version', 'data')]
     )
-    def update_charts(selected_insurances):
-        if selected_insurances is None or len(selected_insurances) == 0:
-            filtered_df = df_merged
-        else:
-            filtered_df = df_merged.filter(
-                df_merged['insurance'].is_in(selected_insurances)
-            )
+    def update_charts(selected_insurances, data_loaded, cross_filters, data_version):
+        if not data_loaded:
+            raise PreventUpdate
+        from functions_by_filtered_data import create_cube_figures
 
-        fig_bar, fig_line, fig_scatter = create_figures(filtered_df)
-        return fig_bar, fig_line, fig_scatter
+        # Every selection is a slice of the cube, so the exact figures are always cheap to draw
+        filters = {name: tuple(value) if name != 'status' else value for name, value in (cross_filters or {}).items()}
+        if selected_insurances:
+            filters['insurance'] = sorted(selected_insurances)
+        return create_cube_figures(tier.get('cube'), filters)
 
-    app.run_server(debug=True, port=8052)
+    return app
@@ -1,29 +1,43 @@
 import polars as pl
 import plotly.express as px
 
-# Function to create the figures based on the filtered data
-def create_figures(df_merged):
+AGE_BAND_YEARS = 10
+DURATION_BUCKET_MINUTES = 10
 
-    result = df_merged.group_by(["status", "insurance"]).agg(
-        pl.len().alias("count")
+
+def cross_filter_from_click(chart_id, point):
+    # Clicking a bar filters its status, a line point its age band, a scatter point its duration bucket
+    if chart_id == 'bar-chart':
+        return 'status', [point['customdata'][0]]
+    if chart_id == 'line-chart':
+        low = int(point['x']) // AGE_BAND_YEARS * AGE_BAND_YEARS
+        return 'age', [low, low + AGE_BAND_YEARS - 1]
+    low = int(point['x']) // DURATION_BUCKET_MINUTES * DURATION_BUCKET_MINUTES
+    return 'duration_minutes', [low, low + DURATION_BUCKET_MINUTES - 1]
+
+
+def create_cube_figures(cube, filters):
+    # Exact figures from the shared count cube, only the filtered cells are summed
+    status_counts = cube.count_by(["status", "insurance"], filters)
+    age_counts = cube.count_by(["age", "insurance"], filters)
+    duration_counts = cube.count_by(["duration_minutes", "insurance"], filters).rename(
+        {"duration_minutes": "time_diff_minutes"}
     )
-    result = result.sort("count", descending=True)
+    return figures_from_counts(status_counts, age_counts, duration_counts)
+
+
+def figures_from_counts(status_counts, age_counts, duration_counts):
+    result = status_counts.sort("count", descending=True)
     df = result.to_pandas()
-    fig_bar = px.bar(df, x='insurance', y='count', color='status', title='top insurance')
+    fig_bar = px.bar(df, x='insurance', y='count', color='status', title='top insurance',
+                     custom_data=['status'])
 
-    result = df_merged.group_by(["age", "insurance"]).agg(
-        pl.len().alias("count")
-    )
-    result = result.sort(["age","count"], descending=True)
+    result = age_counts.sort(["age","count"], descending=True)
     df = result.to_pandas()
     fig_line = px.line(df, x='age', y='count', color='insurance', title='top insurance', markers=True)
 
-    result = df_merged.group_by(["appointment_duration", "insurance"]).agg(
-        pl.len().alias("count")
-    )
-    result = result.sort(["appointment_duration","count"], descending=True)
+    result = duration_counts.sort(["time_diff_minutes","count"], descending=True)
     df = result.to_pandas()
-    df['time_diff_minutes'] = df['appointment_duration'].dt.total_seconds() / 60
     fig = px.scatter(
         df, x='time_diff_minutes', y='count', color='insurance',
         trendline='lowess',  # Locally weighted regression
@@ -33,7 +47,7 @@ def create_figures(df_merged):
         lambda trace: trace.update(marker=dict(opacity=0)) if 'trendline' not in trace.name else None
     )
     y_max = df['count'].max()
-    fig.update_xaxes(range=[0, 60]) 
-    fig.update_yaxes(range=[0, 110]) 
+    fig.update_xaxes(range=[0, 60])
+    fig.update_yaxes(range=[0, y_max * 1.1 if len(df) else 1])
 
-    return fig_line, fig_bar, fig
\ No newline at end of file
+    return fig_bar, fig_line, fig
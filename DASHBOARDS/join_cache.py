@@ -0,0 +1,73 @@
+import os
+import polars as pl
+
+APPOINTMENTS_PATIENTS_DIR = "appointments_patients"
+ROW_INDEX_FILE = "_rows.parquet"
+PATIENT_ATTRIBUTES_FILE = "patient_attributes.parquet"
+PATIENT_ATTRIBUTES = ["insurance"]
+PATIENT_BUCKETS = 16
+
+
+def _bucket_path(table_dir: str, bucket: int) -> str:
+    return os.path.join(table_dir, f"bucket-{bucket:02d}.parquet")
+
+
+def _write_atomic(df: pl.DataFrame, path: str) -> None:
+    df.write_parquet(path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def refresh_appointments_patients(appointments_df: pl.DataFrame, patients_df: pl.DataFrame, store_dir: str, attributes=None) -> None:
+    # Keep a persisted appointments x patient-attributes table split into patient_id buckets, only
+    # re-joining and rewriting the buckets that hold a new, changed or removed appointment or a patient
+    # whose attributes changed. Changes are found from a narrow (appointment_id, patient_id, row_hash)
+    # index, so an unchanged snapshot never reads the joined table back.
+    attributes = attributes or PATIENT_ATTRIBUTES
+    table_dir = os.path.join(store_dir, APPOINTMENTS_PATIENTS_DIR)
+    index_path = os.path.join(table_dir, ROW_INDEX_FILE)
+    attributes_path = os.path.join(store_dir, PATIENT_ATTRIBUTES_FILE)
+    patient_attributes = patients_df.select(["patient_id", *attributes])
+
+    # The hash covers every appointment column, so a new status or duration counts as a change
+    rows = appointments_df.select("appointment_id", "patient_id", appointments_df.hash_rows().alias("row_hash"))
+
+    if os.path.exists(index_path) and os.path.exists(attributes_path):
+        cached_rows = pl.read_parquet(index_path)
+        cached_attributes = pl.read_parquet(attributes_path)
+
+        # Patients that are new or whose attributes differ from the snapshot used for the cached join
+        changed_patients = patient_attributes.join(
+            cached_attributes, on=["patient_id", *attributes], how="anti", join_nulls=True
+        )["patient_id"]
+        # New or changed rows of the snapshot, and cached rows that were removed or replaced (the hash
+        # includes appointment_id, so it alone identifies a version of an appointment)
+        if rows.equals(cached_rows):
+            changed_rows = pl.Series("patient_id", [], pl.Int64)
+        else:
+            changed_rows = pl.concat([
+                rows.filter(~pl.col("row_hash").is_in(cached_rows["row_hash"])),
+                cached_rows.filter(~pl.col("row_hash").is_in(rows["row_hash"])),
+            ])["patient_id"]
+        buckets = pl.concat([changed_patients, changed_rows]).drop_nulls().unique() % PATIENT_BUCKETS
+        buckets = set(buckets.to_list())
+        if changed_rows.has_nulls() or changed_patients.has_nulls():
+            buckets.add(PATIENT_BUCKETS)
+    else:
+        buckets = set(range(PATIENT_BUCKETS + 1))
+
+    # Appointments without a patient get a bucket of their own, after the patient_id buckets
+    bucket_of = pl.col("patient_id").mod(PATIENT_BUCKETS).fill_null(PATIENT_BUCKETS)
+    os.makedirs(table_dir, exist_ok=True)
+    for bucket in sorted(buckets):
+        joined_df = appointments_df.filter(bucket_of == bucket).join(patient_attributes, on="patient_id", how="left")
+        _write_atomic(joined_df.sort("patient_id"), _bucket_path(table_dir, bucket))
+
+    # The index and attributes go last, so an interrupted refresh is redone on the next start
+    if buckets:
+        _write_atomic(patient_attributes, attributes_path)
+        _write_atomic(rows, index_path)
+
+
+def scan_appointments_patients(store_dir: str) -> pl.LazyFrame:
+    table_dir = os.path.join(store_dir, APPOINTMENTS_PATIENTS_DIR)
+    return pl.scan_parquet([_bucket_path(table_dir, bucket) for bucket in range(PATIENT_BUCKETS + 1)])
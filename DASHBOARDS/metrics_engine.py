@@ -0,0 +1,90 @@
+import math
+import polars as pl
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Operational measures in minutes, derived from the parsed appointments columns
+MEASURES = {
+    "waiting_time": pl.col("waiting_time").dt.total_seconds() / 60,
+    "appointment_duration": pl.col("appointment_duration").dt.total_seconds() / 60,
+    "arrival_offset": (pl.col("check_in_time") - pl.col("appointment_time")).dt.total_seconds() / 60,
+}
+
+
+class MetricsEngine:
+    """Mergeable quantile sketches of the operational measures per day and insurance.
+
+    Each (day, insurance, measure) keeps a DDSketch: counts per logarithmic
+    bucket, so any quantile read back is within ``relative_accuracy`` of the
+    true value. All sketches live in one long table; merging the sketches of
+    a date range and insurance subset is a filtered sum of bucket counts, so
+    queries never touch raw rows.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.sketches = pl.DataFrame(schema={
+            "day": pl.Date,
+            "insurance": pl.String,
+            "measure": pl.String,
+            "sign": pl.Int8,
+            "bucket": pl.Int32,
+            "count": pl.UInt64,
+        })
+
+    def add(self, appointments_df: pl.DataFrame) -> None:
+        # Needs appointment_date, insurance and the parsed time columns of get_appointments_df
+        values = appointments_df.select(
+            pl.col("appointment_date").alias("day"),
+            pl.col("insurance"),
+            *[expr.alias(name) for name, expr in MEASURES.items()],
+        ).unpivot(
+            index=["day", "insurance"], variable_name="measure", value_name="value"
+        ).drop_nulls("value")
+
+        buckets = values.with_columns(
+            pl.when(pl.col("value").abs() < self.min_value).then(0)
+            .otherwise(pl.col("value").sign()).cast(pl.Int8).alias("sign"),
+            (pl.col("value").abs().clip(lower_bound=self.min_value).log() / self.log_gamma)
+            .ceil().cast(pl.Int32).alias("bucket"),
+        ).with_columns(
+            pl.when(pl.col("sign") == 0).then(0).otherwise(pl.col("bucket")).cast(pl.Int32).alias("bucket")
+        ).group_by(["day", "insurance", "measure", "sign", "bucket"]).agg(
+            pl.len().cast(pl.UInt64).alias("count")
+        )
+        self._merge(buckets)
+
+    def _merge(self, buckets: pl.DataFrame) -> None:
+        self.sketches = pl.concat([self.sketches, buckets.select(self.sketches.columns)]).group_by(
+            ["day", "insurance", "measure", "sign", "bucket"]
+        ).agg(pl.col("count").sum())
+
+    def quantiles(self, start_date, end_date, insurances=None, quantiles=QUANTILES) -> pl.DataFrame:
+        # One row per measure with the merged sample size and the requested quantiles
+        selected = self.sketches.filter(pl.col("day").is_between(start_date, end_date))
+        if insurances:
+            selected = selected.filter(pl.col("insurance").is_in(insurances))
+
+        merged = selected.group_by(["measure", "sign", "bucket"]).agg(pl.col("count").sum()).with_columns(
+            # Bucket representative that keeps the relative error within the accuracy bound
+            (pl.col("sign") * 2 * self.gamma ** pl.col("bucket") / (self.gamma + 1)).alias("value")
+        ).sort(["measure", "value"]).with_columns(
+            pl.col("count").cum_sum().over("measure").alias("rank"),
+            pl.col("count").sum().over("measure").alias("total"),
+        )
+
+        rows = []
+        for (measure,), sketch in merged.partition_by("measure", as_dict=True, maintain_order=True).items():
+            total = sketch["total"][0]
+            row = {"measure": measure, "count": total}
+            for q in quantiles:
+                row[f"p{round(q * 100)}"] = sketch.filter(pl.col("rank") > q * (total - 1))["value"][0]
+            rows.append(row)
+        return pl.DataFrame(rows, schema={
+            "measure": pl.String,
+            "count": pl.UInt64,
+            **{f"p{round(q * 100)}": pl.Float64 for q in quantiles},
+        })
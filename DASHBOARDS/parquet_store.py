@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import logging
+import uuid
+from contextlib import contextmanager
+from datetime import date
+import polars as pl
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+APPOINTMENTS_DIR = "appointments"
+STATS_FILE = "_stats.json"
+STATS_LOCK_FILE = "_stats.lock"
+STALE_FILE_SECONDS = 600  # files no longer listed in the stats are kept this long for scans already planned
+
+logger = logging.getLogger(__name__)
+
+
+def _partitions(appointments_df: pl.DataFrame, date_col: str) -> dict:
+    # Rows without a date belong to no month and no date range query can match them, so they are not stored
+    undated = appointments_df[date_col].null_count()
+    if undated:
+        logger.warning("skipping %d appointments without %s", undated, date_col)
+    df = appointments_df.filter(pl.col(date_col).is_not_null()).with_columns(
+        pl.col(date_col).dt.year().alias("year"),
+        pl.col(date_col).dt.month().alias("month"),
+    )
+    return {
+        f"year={year}/month={month}": part.drop(["year", "month"])
+        for (year, month), part in df.partition_by(["year", "month"], as_dict=True).items()
+    }
+
+
+def _write_partition_file(store_dir: str, partition: str, part: pl.DataFrame, file_name: str) -> None:
+    part_dir = os.path.join(store_dir, APPOINTMENTS_DIR, partition)
+    os.makedirs(part_dir, exist_ok=True)
+    part.write_parquet(os.path.join(part_dir, file_name))
+
+
+def _partition_digest(part: pl.DataFrame) -> str:
+    # Order-independent fingerprint of the rows, so an unchanged month is not rewritten
+    return f"{part.height}-{part.hash_rows().sum()}"
+
+
+def write_appointments(appointments_df: pl.DataFrame, store_dir: str, date_col: str = "appointment_date") -> None:
+    # Replace the stored appointments with year=/month= partitions of the given frame, one partition at a time:
+    # new files are written first and only then listed in the stats, so workers sharing the store never scan a
+    # half-written month, and replaced files are removed once they have been unlisted for STALE_FILE_SECONDS
+    file_name = f"part-{uuid.uuid4().hex}.parquet"
+    parts = _partitions(appointments_df, date_col)
+    stored = read_partition_stats(store_dir)
+    written = {}
+    for partition, part in parts.items():
+        digest = _partition_digest(part)
+        if stored.get(partition, {}).get("digest") == digest:
+            continue
+        _write_partition_file(store_dir, partition, part, file_name)
+        written[partition] = {
+            "min": part[date_col].min().isoformat(),
+            "max": part[date_col].max().isoformat(),
+            "rows": part.height,
+            "files": [file_name],
+            "digest": digest,
+        }
+
+    with _stats_lock(store_dir):
+        stats = read_partition_stats(store_dir)
+        stats = {partition: entry for partition, entry in stats.items() if partition in parts}
+        stats.update(written)
+        _write_partition_stats(store_dir, stats)
+    _remove_unlisted_files(store_dir, stats)
+
+
+def append_appointments(appointments_df: pl.DataFrame, store_dir: str, date_col: str = "appointment_date") -> None:
+    # Every call writes one new file per touched partition, so older files are never rewritten
+    file_name = f"part-{uuid.uuid4().hex}.parquet"
+    parts = _partitions(appointments_df, date_col)
+    for partition, part in parts.items():
+        _write_partition_file(store_dir, partition, part, file_name)
+
+    with _stats_lock(store_dir):
+        stats = read_partition_stats(store_dir)
+        for partition, part in parts.items():
+            # Keep min/max of the date column per partition so range queries can skip whole months
+            part_min, part_max = part[date_col].min(), part[date_col].max()
+            entry = stats.setdefault(partition, {"min": part_min.isoformat(), "max": part_max.isoformat(), "rows": 0, "files": []})
+            entry["min"] = min(entry["min"], part_min.isoformat())
+            entry["max"] = max(entry["max"], part_max.isoformat())
+            entry["rows"] += part.height
+            entry["files"].append(file_name)
+            entry.pop("digest", None)
+        _write_partition_stats(store_dir, stats)
+
+
+@contextmanager
+def _stats_lock(store_dir: str):
+    # Serializes read-modify-write of the stats between workers sharing the store
+    root = os.path.join(store_dir, APPOINTMENTS_DIR)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, STATS_LOCK_FILE), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _remove_unlisted_files(store_dir: str, stats: dict) -> None:
+    # Files another worker is still writing are recent, so the age check also leaves those alone
+    root = os.path.join(store_dir, APPOINTMENTS_DIR)
+    listed = {os.path.join(root, partition, file_name) for partition, entry in stats.items() for file_name in entry["files"]}
+    cutoff = time.time() - STALE_FILE_SECONDS
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            if not file_name.endswith(".parquet") or path in listed:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def read_partition_stats(store_dir: str) -> dict:
+    stats_path = os.path.join(store_dir, APPOINTMENTS_DIR, STATS_FILE)
+    if not os.path.exists(stats_path):
+        return {}
+    with open(stats_path) as f:
+        return json.load(f)
+
+
+def _write_partition_stats(store_dir: str, stats: dict) -> None:
+    stats_path = os.path.join(store_dir, APPOINTMENTS_DIR, STATS_FILE)
+    os.makedirs(os.path.dirname(stats_path), exist_ok=True)
+    tmp_path = stats_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stats, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, stats_path)
+
+
+def appointment_date_range(store_dir: str) -> tuple[date, date]:
+    stats = read_partition_stats(store_dir)
+    return (
+        date.fromisoformat(min(entry["min"] for entry in stats.values())),
+        date.fromisoformat(max(entry["max"] for entry in stats.values())),
+    )
+
+
+def _listed_files(store_dir: str, stats: dict, start_date: date = None, end_date: date = None) -> list:
+    # Only files listed in the stats are read, replaced files may still be on disk for a while
+    root = os.path.join(store_dir, APPOINTMENTS_DIR)
+    return [
+        os.path.join(root, partition, file_name)
+        for partition, entry in sorted(stats.items())
+        if end_date is None or (entry["min"] <= end_date.isoformat() and entry["max"] >= start_date.isoformat())
+        for file_name in entry["files"]
+    ]
+
+
+def scan_appointments(store_dir: str) -> pl.LazyFrame:
+    return pl.scan_parquet(_listed_files(store_dir, read_partition_stats(store_dir)))
+
+
+def scan_appointments_between(store_dir: str, start_date: date, end_date: date, date_col: str = "appointment_date") -> pl.LazyFrame:
+    # Partition pruning: only files of months whose [min, max] overlaps the window are scanned
+    stats = read_partition_stats(store_dir)
+    files = _listed_files(store_dir, stats, start_date, end_date)
+    if not files:
+        return pl.scan_parquet(_listed_files(store_dir, stats)).clear()
+    return pl.scan_parquet(files).filter(pl.col(date_col).is_between(start_date, end_date))
+
+
+def collect_streaming(lf: pl.LazyFrame) -> pl.DataFrame:
+    # Run the query with the streaming engine so memory stays bounded by the batch size
+    return lf.collect(streaming=True)
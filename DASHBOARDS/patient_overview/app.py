@@ -0,0 +1,167 @@
+import dash
+from dash import dcc, html
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from deferred_load import DeferredLoad
+from data_tier import create_data_tier, register_report_route
+
+
+def create_dash_app(store_dir=None, fast_start=False, change_feed_interval=None, change_log=None, memory_budget_mb=None, spill_dir=None):
+    api_url = os.environ.get('DASHBOARD_API_URL', 'http://localhost:8000/app')
+
+    # Callbacks read the patient summary from the tier, which spills the least used entries beyond the memory budget
+    tier = create_data_tier(memory_budget_mb, spill_dir, store_dir)
+
+    def load_data():
+        # Heavy modules (polars, pandas, plotly) are only imported here
+        from api_requests import get_api_client, get_appointments_df, get_patients_df
+        from patient_summary import PatientSummary
+
+        # Get appointment and patient data
+        appointments_url = f'{api_url}/appointments/'
+        appointments_df = get_appointments_df(appointments_url)
+        patients_url = f'{api_url}/patients'
+        patients_df = get_patients_df(patients_url)
+
+        # Only the parsed frames are kept, drop the raw payloads from the shared API client
+        get_api_client().release(appointments_url)
+        get_api_client().release(patients_url)
+
+        # Per-patient summary, persisted in store mode so a restart only recomputes patients whose appointments changed
+        patient_summary = PatientSummary.load(store_dir) if store_dir else PatientSummary()
+        patient_summary.refresh(appointments_df, patients_df)
+        if store_dir:
+            patient_summary.save(store_dir)
+        del appointments_df, patients_df
+
+        # Callbacks only read the compact summary, never the appointments
+        summary_df = patient_summary.summary()
+        tier.put('summary_df', summary_df)
+        loaded = {
+            'insurances': summary_df["insurance"].drop_nulls().unique().sort().to_list(),
+            'version': 0,
+        }
+
+        # Change feed: recompute the summary rows of patients whose appointments changed
+        if change_feed_interval:
+            from incremental_aggregates import ApiChangeFeed, ChangeLogFeed, start_polling
+
+            # The per-appointment visits table is only needed between polls, so it may be spilled too
+            tier.put('patient_summary', patient_summary)
+            del patient_summary
+
+            def apply_changes(upserts, deleted_ids):
+                patient_summary = tier.get('patient_summary')
+                patient_summary.apply(upserts, deleted_ids)
+                if store_dir:
+                    patient_summary.save(store_dir)
+                tier.put('patient_summary', patient_summary)
+                tier.put('summary_df', patient_summary.summary())
+                loaded['version'] = patient_summary.version
+
+            # Deletes only arrive through the change log, the API feed reports inserts and updates
+            feed = ChangeLogFeed(change_log) if change_log else ApiChangeFeed(appointments_url)
+            start_polling(feed, apply_changes, change_feed_interval)
+        else:
+            del patient_summary
+
+        return loaded
+
+    # Fast-start mode: serve the layout right away and load the data in the background
+    data = DeferredLoad(load_data)
+    if fast_start:
+        data.start()
+    else:
+        data.run()
+
+    # Initialize Dash app
+    app = dash.Dash(__name__)
+    register_report_route(app.server, tier)
+
+    # App layout
+    app.layout = html.Div([
+        html.H1("Patient Population Dashboard"),
+        html.Div("Loading patient data...", id='data-status'),
+        dcc.Interval(id='data-poll', interval=500),
+        dcc.Store(id='data-loaded'),
+        dcc.Interval(id='refresh-poll', interval=(change_feed_interval or 1) * 1000, disabled=not change_feed_interval),
+        dcc.Store(id='data-version', data=0),
+
+        dcc.Dropdown(
+            id='insurance-filter',
+            options=[],
+            multi=True,
+            placeholder="Select Insurance Plans",
+        ),
+
+        html.Div([
+            html.Span(id='total-patients'),
+            html.Span(id='active-patients'),
+            html.Span(id='no-show-rate'),
+            html.Span(id='last-visit'),
+        ]),
+
+        dcc.Graph(id='population-pyramid'),
+        dcc.Graph(id='visit-frequency'),
+    ])
+
+    # Callback to fill in the filter options once the data has been loaded
+    @app.callback(
+        [Output('insurance-filter', 'options'),
+        Output('data-loaded', 'data'),
+        Output('data-status', 'children'),
+        Output('data-poll', 'disabled')],
+        [Input('data-poll', 'n_intervals')]
+    )
+    def show_loaded_data(n_intervals):
+        if not data.ready():
+            raise PreventUpdate
+        if data.failed():
+            return [], False, "Failed to load patient data", True
+
+        options = [{'label': i, 'value': i} for i in data.get()['insurances']]
+        return options, True, "", True
+
+    # Callback to redraw when the change feed has updated the summary
+    @app.callback(
+        Output('data-version', 'data'),
+        [Input('refresh-poll', 'n_intervals')],
+        [State('data-version', 'data')]
+    )
+    def check_data_version(n_intervals, current_version):
+        if not data.ready() or data.failed() or data.get()['version'] == current_version:
+            raise PreventUpdate
+        return data.get()['version']
+
+    # Callback to update the KPIs and charts based on the selected insurance
+    @app.callback(
+        [Output('total-patients', 'children'),
+        Output('active-patients', 'children'),
+        Output('no-show-rate', 'children'),
+        Output('last-visit', 'children'),
+        Output('population-pyramid', 'figure'),
+        Output('visit-frequency', 'figure')],
+        [Input('insurance-filter', 'value'),
+        Input('data-loaded', 'data'),
+        Input('data-version', 'data')]
+    )
+    def update_charts(selected_insurances, data_loaded, data_version):
+        if not data_loaded:
+            raise PreventUpdate
+        from functions_by_filtered_data import filter_patients, calculate_kpis, create_population_pyramid, create_visit_frequency
+
+        summary_df = filter_patients(tier.get('summary_df'), selected_insurances)
+        patients, active_patients, no_show_rate, last_visit = calculate_kpis(summary_df)
+        return (
+            f"Patients: {patients} ",
+            f"With visits: {active_patients} ",
+            f"No-show rate: {no_show_rate} ",
+            f"Last visit: {last_visit}",
+            create_population_pyramid(summary_df),
+            create_visit_frequency(summary_df),
+        )
+
+    return app
@@ -0,0 +1,54 @@
+import polars as pl
+import plotly.express as px
+
+MIN_VISIT_SHARE = 0.1  # percent, visit counts with fewer patients are left out of the frequency chart
+
+
+def filter_patients(summary_df, selected_insurances):
+    if selected_insurances:
+        summary_df = summary_df.filter(pl.col("insurance").is_in(selected_insurances))
+    return summary_df
+
+
+def create_population_pyramid(summary_df):
+    # Patients (not appointments) per age group and sex, males drawn to the left
+    counts = summary_df.filter(pl.col("age_group").is_not_null() & pl.col("sex").is_in(["Male", "Female"])).group_by(
+        ["age_group", "sex"]
+    ).agg(pl.len().cast(pl.Int64).alias("patients")).with_columns(
+        pl.col("age_group").str.split("-").list.first().cast(pl.Int64).alias("age_low"),
+        pl.when(pl.col("sex") == "Male").then(-pl.col("patients")).otherwise(pl.col("patients")).alias("population"),
+        (pl.col("patients") / pl.col("patients").sum()).alias("share"),
+    ).sort(["age_low", "sex"])
+    df = counts.to_pandas()
+
+    fig = px.bar(
+        df, x='population', y='age_group', color='sex', orientation='h', barmode='relative',
+        title='Population distribution by age and sex', custom_data=['patients', 'share'],
+        color_discrete_map={'Male': '#4583b5', 'Female': '#ef7a84'},
+    )
+    fig.update_traces(hovertemplate='%{y}: %{customdata[0]} patients (%{customdata[1]:.1%})')
+    fig.update_xaxes(title='Patients', tickformat='d')
+    fig.update_yaxes(title='Age group', categoryorder='array', categoryarray=df['age_group'].drop_duplicates().tolist())
+    return fig
+
+
+def create_visit_frequency(summary_df):
+    # Patients by number of attended visits, as a share of the selected patients
+    counts = summary_df.group_by("visits").agg(pl.len().alias("patients")).with_columns(
+        (pl.col("patients") / pl.col("patients").sum() * 100).alias("percentage")
+    ).filter(pl.col("percentage") >= MIN_VISIT_SHARE).sort("visits")
+    df = counts.to_pandas()
+
+    fig = px.bar(df, x='visits', y='patients', title='Patient visit distribution', text='percentage')
+    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside', marker_color='#67A7D4')
+    fig.update_xaxes(title='Number of visits', dtick=1)
+    fig.update_yaxes(title='Number of patients')
+    return fig
+
+
+def calculate_kpis(summary_df):
+    patients = summary_df.height
+    active_patients = summary_df.filter(pl.col("visits") > 0).height
+    no_show_rate = summary_df["no_shows"].sum() / max(summary_df["visits"].sum() + summary_df["no_shows"].sum(), 1)
+    last_visit = summary_df["last_visit"].max()
+    return patients, active_patients, f"{no_show_rate:.1%}", last_visit.isoformat() if last_visit else "-"
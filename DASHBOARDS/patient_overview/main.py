@@ -0,0 +1,16 @@
+import os
+from app import create_dash_app
+
+if __name__ == '__main__':
+    
+    change_feed_interval = os.environ.get('DASHBOARD_CHANGE_FEED_INTERVAL')
+    memory_budget_mb = os.environ.get('DASHBOARD_MEMORY_BUDGET_MB')
+    app = create_dash_app(
+        store_dir=os.environ.get('DASHBOARD_STORE_DIR'),
+        fast_start=os.environ.get('DASHBOARD_FAST_START') == '1',
+        change_feed_interval=float(change_feed_interval) if change_feed_interval else None,
+        change_log=os.environ.get('DASHBOARD_CHANGE_LOG'),
+        memory_budget_mb=float(memory_budget_mb) if memory_budget_mb else None,
+        spill_dir=os.environ.get('DASHBOARD_SPILL_DIR'),
+    )
+    app.run_server(port=8070)
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+from datetime import date
+import polars as pl
+
+PATIENT_VISITS_FILE = "patient_visits.parquet"
+PATIENT_SUMMARY_FILE = "patient_summary.parquet"
+AGE_BAND_YEARS = 10
+
+# The only appointment columns the summary depends on, kept per appointment to recompute a patient's row
+VISIT_COLUMNS = {
+    "appointment_id": pl.Int64,
+    "patient_id": pl.Int64,
+    "status": pl.String,
+    "appointment_date": pl.Date,
+}
+STATS_COLUMNS = ["patient_id", "appointments", "visits", "no_shows", "last_visit"]
+ATTRIBUTE_COLUMNS = ["patient_id", "sex", "age_group", "insurance"]
+
+
+def _visit_stats(visits: pl.DataFrame) -> pl.DataFrame:
+    attended = pl.col("status") == "attended"
+    return visits.group_by("patient_id").agg(
+        pl.len().cast(pl.Int64).alias("appointments"),
+        attended.sum().cast(pl.Int64).alias("visits"),
+        (pl.col("status") == "did not attend").sum().cast(pl.Int64).alias("no_shows"),
+        pl.col("appointment_date").filter(attended).max().alias("last_visit"),
+    )
+
+
+def patient_attributes(patients_df: pl.DataFrame, as_of: date = None) -> pl.DataFrame:
+    # Current age band from the date of birth, so every patient is placed even without appointments
+    as_of = as_of or date.today()
+    age = ((pl.lit(as_of) - pl.col("dob")).dt.total_days() / 365.25).floor().cast(pl.Int64)
+    low = age // AGE_BAND_YEARS * AGE_BAND_YEARS
+    return patients_df.select(
+        pl.col("patient_id"),
+        pl.col("sex"),
+        pl.format("{}-{}", low, low + AGE_BAND_YEARS - 1).alias("age_group"),
+        pl.col("insurance"),
+    )
+
+
+class PatientSummary:
+    """One row per patient: visit count, no-show rate, last visit, age group and insurance.
+
+    Next to the summary it keeps a narrow per-appointment table
+    (``VISIT_COLUMNS``). Refreshing from a new appointments snapshot, or
+    applying change-feed upserts and deletes, only recomputes the rows of
+    patients whose appointments changed.
+    """
+
+    def __init__(self, visits: pl.DataFrame = None, stats: pl.DataFrame = None, attributes: pl.DataFrame = None):
+        self.visits = visits if visits is not None else pl.DataFrame(schema=VISIT_COLUMNS)
+        self.stats = stats if stats is not None else _visit_stats(self.visits)
+        self.attributes = attributes if attributes is not None else pl.DataFrame(
+            schema={"patient_id": pl.Int64, "sex": pl.String, "age_group": pl.String, "insurance": pl.String}
+        )
+        self.version = 0
+
+    @classmethod
+    def load(cls, store_dir: str) -> "PatientSummary":
+        visits_path = os.path.join(store_dir, PATIENT_VISITS_FILE)
+        summary_path = os.path.join(store_dir, PATIENT_SUMMARY_FILE)
+        if not (os.path.exists(visits_path) and os.path.exists(summary_path)):
+            return cls()
+        summary_df = pl.read_parquet(summary_path)
+        return cls(
+            pl.read_parquet(visits_path),
+            summary_df.filter(pl.col("appointments") > 0).select(STATS_COLUMNS),
+            summary_df.select(ATTRIBUTE_COLUMNS),
+        )
+
+    def save(self, store_dir: str) -> None:
+        os.makedirs(store_dir, exist_ok=True)
+        self.visits.sort("patient_id").write_parquet(os.path.join(store_dir, PATIENT_VISITS_FILE))
+        self.summary().write_parquet(os.path.join(store_dir, PATIENT_SUMMARY_FILE))
+
+    def _update(self, new_rows: pl.DataFrame, removed_ids: pl.Series) -> None:
+        touched = pl.concat([new_rows["appointment_id"], removed_ids])
+        if touched.is_empty():
+            return
+        # Patients of the previous and the new version of each touched appointment
+        affected = pl.concat([
+            self.visits.filter(pl.col("appointment_id").is_in(touched))["patient_id"],
+            new_rows["patient_id"],
+        ]).unique()
+
+        self.visits = pl.concat([self.visits.filter(~pl.col("appointment_id").is_in(touched)), new_rows])
+        self.stats = pl.concat([
+            self.stats.filter(~pl.col("patient_id").is_in(affected)),
+            _visit_stats(self.visits.filter(pl.col("patient_id").is_in(affected))),
+        ])
+
+    def refresh(self, appointments_df: pl.DataFrame, patients_df: pl.DataFrame) -> None:
+        # Diff a full appointments snapshot against the kept visits, as join_cache does for the joined table
+        current = appointments_df.select(list(VISIT_COLUMNS)).unique("appointment_id", keep="last")
+        new_rows = current.join(self.visits, on=list(VISIT_COLUMNS), how="anti", join_nulls=True)
+        removed_ids = self.visits.filter(~pl.col("appointment_id").is_in(current["appointment_id"]))["appointment_id"]
+        self.attributes = patient_attributes(patients_df)
+        self._update(new_rows, removed_ids)
+        self.version += 1
+
+    def apply(self, upserts: pl.DataFrame = None, deleted_ids=None) -> None:
+        # Same (upserts, deleted_ids) shape as the change feeds in incremental_aggregates
+        new_rows = upserts.select(list(VISIT_COLUMNS)).unique("appointment_id", keep="last") \
+            if upserts is not None else pl.DataFrame(schema=VISIT_COLUMNS)
+        self._update(new_rows, pl.Series("appointment_id", list(deleted_ids or []), pl.Int64))
+        self.version += 1
+
+    def summary(self) -> pl.DataFrame:
+        # Patients without appointments get zero counts, the no-show rate is over attended + missed appointments
+        return self.attributes.join(self.stats, on="patient_id", how="full", coalesce=True).with_columns(
+            pl.col(["appointments", "visits", "no_shows"]).fill_null(0),
+        ).with_columns(
+            (pl.col("no_shows") / (pl.col("visits") + pl.col("no_shows"))).fill_nan(None).alias("no_show_rate"),
+        ).sort("patient_id")
@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import time
+import argparse
+import polars as pl
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'DASHBOARDS')))
+from api_requests import APPOINTMENTS_SCHEMA, read_records
+from synthetic_data import generate_payloads
+
+
+def ingest_inferred(content: bytes) -> pl.DataFrame:
+    # Previous path: Python objects per row, then schema inference
+    return pl.DataFrame(json.loads(content))
+
+
+def ingest_declared(content: bytes) -> pl.DataFrame:
+    return read_records(content, APPOINTMENTS_SCHEMA)
+
+
+def best_of(func, content: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Appointments ingestion throughput (rows/sec)")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    content, _ = generate_payloads(args.rows)
+    print(f"payload: {args.rows} rows, {len(content) / 1e6:.1f} MB")
+    for name, func in [("inferred", ingest_inferred), ("declared, strict", ingest_declared)]:
+        seconds = best_of(func, content, args.repeat)
+        print(f"{name:>16}: {seconds * 1000:8.1f} ms  {args.rows / seconds:12,.0f} rows/sec")
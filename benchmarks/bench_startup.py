@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import requests
+from synthetic_api import start_synthetic_api
+
+DASHBOARDS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'DASHBOARDS'))
+DASHBOARD_PORTS = {
+    "appointment_overview": 8060,
+    "insurance_overview": 8050,
+    "patient_overview": 8070,
+}
+
+
+def time_to_first_response(dashboard: str, api_url: str, fast_start: bool, timeout: float) -> float:
+    # Seconds from process spawn until the dashboard answers GET / with 200
+    env = dict(os.environ, DASHBOARD_API_URL=api_url, DASHBOARD_FAST_START="1" if fast_start else "0")
+    url = f"http://127.0.0.1:{DASHBOARD_PORTS[dashboard]}/"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=os.path.join(DASHBOARDS_DIR, dashboard), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{dashboard} exited with code {process.returncode}")
+            try:
+                if requests.get(url, timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"{dashboard} did not respond within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def time_to_import(dashboard: str) -> float:
+    # Seconds to import the dashboard's app module in a fresh interpreter
+    code = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=os.path.join(DASHBOARDS_DIR, dashboard))
+    return float(output.decode().strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Dashboard time-to-first-response, with and without fast start")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--api-port", type=int, default=8099)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", help="also write the results to this file, for tracking across commits")
+    args = parser.parse_args()
+
+    start_synthetic_api(args.api_port, args.rows)
+    api_url = f"http://127.0.0.1:{args.api_port}/app"
+
+    results = {"rows": args.rows, "dashboards": {}}
+    for dashboard in DASHBOARD_PORTS:
+        result = {"import_s": min(time_to_import(dashboard) for _ in range(args.repeat))}
+        for fast_start in (False, True):
+            key = "fast_start_s" if fast_start else "blocking_start_s"
+            result[key] = min(
+                time_to_first_response(dashboard, api_url, fast_start, args.timeout) for _ in range(args.repeat)
+            )
+        results["dashboards"][dashboard] = result
+        print(
+            f"{dashboard:>22}: import {result['import_s']:.2f}s  "
+            f"first response {result['blocking_start_s']:.2f}s blocking / {result['fast_start_s']:.2f}s fast start"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
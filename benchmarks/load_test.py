@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import subprocess
+from datetime import date, timedelta
+import numpy as np
+import psutil
+import requests
+from synthetic_api import start_synthetic_api
+
+DASHBOARDS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'DASHBOARDS'))
+
+LAUNCH_CODE = (
+    "import os, sys; from app import create_dash_app; "
+    "budget = os.environ.get('DASHBOARD_MEMORY_BUDGET_MB'); "
+    "create_dash_app(memory_budget_mb=float(budget) if budget else None)"
+    ".run_server(host='127.0.0.1', port=int(sys.argv[1]), debug=False, threaded=True)"
+)
+
+
+def callback_payload(outputs, inputs, changed):
+    # Body of a _dash-update-component POST as sent by the Dash renderer
+    output_ids = [f"{component}.{prop}" for component, prop in outputs]
+    return {
+        "output": output_ids[0] if len(outputs) == 1 else ".." + "...".join(output_ids) + "..",
+        "outputs": [{"id": component, "property": prop} for component, prop in outputs]
+        if len(outputs) > 1 else {"id": outputs[0][0], "property": outputs[0][1]},
+        "inputs": [{"id": component, "property": prop, "value": value} for component, prop, value in inputs],
+        "changedPropIds": [f"{component}.{prop}" for component, prop in changed],
+        "state": [],
+    }
+
+
+class AppointmentOverviewScenario:
+    name = "appointment_overview"
+
+    def __init__(self, loaded):
+        start_date, end_date = loaded["date-picker-range"]["start_date"], loaded["date-picker-range"]["end_date"]
+        self.first_day = date.fromisoformat(start_date[:10])
+        self.days = (date.fromisoformat(end_date[:10]) - self.first_day).days
+
+    @staticmethod
+    def ready_payload():
+        return callback_payload(
+            [("date-picker-range", "start_date"), ("date-picker-range", "end_date"),
+             ("metrics-insurance-filter", "options"), ("data-status", "children"), ("data-poll", "disabled")],
+            [("data-poll", "n_intervals", 1)],
+            [("data-poll", "n_intervals")],
+        )
+
+    def next_payload(self, rng):
+        # update_dashboard with a random date range inside the loaded history
+        start = rng.randint(0, self.days)
+        end = rng.randint(start, self.days)
+        return callback_payload(
+            [("total-appointments", "children"), ("completed-appointments", "children"),
+             ("cancellations", "children"), ("no-show", "children"),
+             ("line-plot", "figure"), ("pie-plot", "figure")],
+            [("date-picker-range", "start_date", (self.first_day + timedelta(days=start)).isoformat()),
+             ("date-picker-range", "end_date", (self.first_day + timedelta(days=end)).isoformat()),
+             ("data-version", "data", 0)],
+            [("date-picker-range", "start_date")],
+        )
+
+
+class InsuranceOverviewScenario:
+    name = "insurance_overview"
+
+    def __init__(self, loaded):
+        self.insurances = [option["value"] for option in loaded["insurance-filter"]["options"]]
+
+    @staticmethod
+    def ready_payload():
+        return callback_payload(
+            [("insurance-filter", "options"), ("data-loaded", "data"),
+             ("data-status", "children"), ("data-poll", "disabled")],
+            [("data-poll", "n_intervals", 1)],
+            [("data-poll", "n_intervals")],
+        )
+
+    def next_payload(self, rng):
+        # update_charts with a random, possibly empty, insurance subset
+        selected = rng.sample(self.insurances, rng.randint(0, len(self.insurances)))
+        return callback_payload(
+            [("bar-chart", "figure"), ("line-chart", "figure"), ("scatter-chart", "figure")],
+            [("insurance-filter", "value", selected), ("data-loaded", "data", True), ("cross-filters", "data", {}),
+             ("data-version", "data", 0)],
+            [("insurance-filter", "value")],
+        )
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (AppointmentOverviewScenario, InsuranceOverviewScenario)}
+
+
+def launch_workers(dashboard, n_workers, base_port, api_url, memory_budget_mb=None):
+    env = dict(os.environ, DASHBOARD_API_URL=api_url)
+    if memory_budget_mb:
+        env["DASHBOARD_MEMORY_BUDGET_MB"] = str(memory_budget_mb)
+    return [
+        subprocess.Popen(
+            [sys.executable, "-c", LAUNCH_CODE, str(base_port + i)],
+            cwd=os.path.join(DASHBOARDS_DIR, dashboard), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for i in range(n_workers)
+    ]
+
+
+def wait_until_ready(url, payload, timeout):
+    # The ready callback answers 204 (PreventUpdate) until the worker has loaded its data
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            response = requests.post(url, json=payload, timeout=5)
+            if response.status_code == 200:
+                return response.json()["response"]
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} was not ready within {timeout}s")
+
+
+def sample_workers(processes, stop, samples):
+    handles = [psutil.Process(process.pid) for process in processes]
+    for handle in handles:
+        handle.cpu_percent(None)
+    while not stop.wait(0.5):
+        for i, handle in enumerate(handles):
+            samples[i]["cpu"].append(handle.cpu_percent(None))
+            samples[i]["rss"].append(handle.memory_info().rss)
+
+
+def run_load(urls, scenario, concurrency, duration, seed):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        url = urls[index % len(urls)]
+        while time.perf_counter() < deadline:
+            payload = scenario.next_payload(rng)
+            started = time.perf_counter()
+            try:
+                ok = session.post(url, json=payload, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent Dash callback load test against synthetic data")
+    parser.add_argument("--dashboard", choices=[*SCENARIOS, "both"], default="both")
+    parser.add_argument("--rows", type=int, default=100_000, help="synthetic appointments served by the API")
+    parser.add_argument("--workers", type=int, default=1, help="dashboard processes, requests are spread round-robin")
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated concurrent users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per dashboard")
+    parser.add_argument("--api-port", type=int, default=8099)
+    parser.add_argument("--base-port", type=int, default=8150)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for workers to load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory-budget-mb", type=float, help="data tier budget of each dashboard process")
+    args = parser.parse_args()
+
+    start_synthetic_api(args.api_port, args.rows)
+    api_url = f"http://127.0.0.1:{args.api_port}/app"
+
+    dashboards = list(SCENARIOS) if args.dashboard == "both" else [args.dashboard]
+    for dashboard in dashboards:
+        scenario_cls = SCENARIOS[dashboard]
+        processes = launch_workers(dashboard, args.workers, args.base_port, api_url, args.memory_budget_mb)
+        urls = [f"http://127.0.0.1:{args.base_port + i}/_dash-update-component" for i in range(args.workers)]
+        try:
+            loaded = [wait_until_ready(url, scenario_cls.ready_payload(), args.timeout) for url in urls][0]
+            scenario = scenario_cls(loaded)
+
+            stop = threading.Event()
+            samples = [{"cpu": [], "rss": []} for _ in processes]
+            sampler = threading.Thread(target=sample_workers, args=(processes, stop, samples))
+            sampler.start()
+            latencies, errors, elapsed = run_load(urls, scenario, args.concurrency, args.duration, args.seed)
+            stop.set()
+            sampler.join()
+            tier_reports = [
+                requests.get(f"http://127.0.0.1:{args.base_port + i}/_data-tier", timeout=5).json()
+                for i in range(args.workers)
+            ]
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+        latencies_ms = np.array(latencies) * 1000
+        print(f"{dashboard}: {args.workers} worker(s), {args.concurrency} concurrent users, {elapsed:.1f}s")
+        print(f"  requests/sec {len(latencies) / elapsed:10.1f}   errors {len(errors)}")
+        if len(latencies_ms):
+            print(f"  latency p50  {np.percentile(latencies_ms, 50):10.1f} ms   p99 {np.percentile(latencies_ms, 99):.1f} ms")
+        for i, sample in enumerate(samples):
+            cpu = np.mean(sample["cpu"]) if sample["cpu"] else 0.0
+            rss = max(sample["rss"]) / 2**20 if sample["rss"] else 0.0
+            print(f"  worker {i}: cpu {cpu:6.1f}%  peak rss {rss:8.1f} MiB")
+            report = tier_reports[i]
+            budget = f"{report['budget_bytes'] / 2**20:.1f} MiB" if report["budget_bytes"] else "unbounded"
+            print(f"            rss {report['rss_bytes'] / 2**20:8.1f} MiB  data tier resident "
+                  f"{report['resident_bytes'] / 2**20:.1f} MiB of {budget}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from synthetic_data import generate_payloads
+
+
+def make_handler(appointments: bytes, patients: bytes):
+    # Serves the two endpoints the dashboards read, with ETags so conditional requests get a 304
+    bodies = {
+        "/app/appointments/": appointments,
+        "/app/patients": patients,
+    }
+    etags = {path: f'"{hashlib.sha1(body).hexdigest()}"' for path, body in bodies.items()}
+
+    class SyntheticApiHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path not in bodies and path.rstrip("/") in bodies:
+                path = path.rstrip("/")
+            if path not in bodies and path + "/" in bodies:
+                path = path + "/"
+            if path not in bodies:
+                self.send_error(404)
+                return
+            if self.headers.get("If-None-Match") == etags[path]:
+                self.send_response(304)
+                self.send_header("ETag", etags[path])
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(bodies[path])))
+            self.send_header("ETag", etags[path])
+            self.end_headers()
+            self.wfile.write(bodies[path])
+
+    return SyntheticApiHandler
+
+
+def start_synthetic_api(port: int, n_appointments: int, n_patients: int = None) -> ThreadingHTTPServer:
+    appointments, patients = generate_payloads(n_appointments, n_patients)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(appointments, patients))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve synthetic appointments and patients like the data API")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    server = start_synthetic_api(args.port, args.rows)
+    print(f"synthetic API on http://127.0.0.1:{args.port}/app ({args.rows} appointments)")
+    threading.Event().wait()
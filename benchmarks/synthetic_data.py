@@ -0,0 +1,72 @@
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+INSURANCES = ["Medicare", "Medicaid", "Blue Cross", "Aetna", "Cigna", "UnitedHealth", "None"]
+STATUSES = ["attended", "cancelled", "did not attend", "scheduled", "unknown"]
+STATUS_WEIGHTS = [70, 10, 10, 8, 2]
+
+
+def _hms(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def generate_patients(n_patients: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    patients = []
+    for patient_id in range(1, n_patients + 1):
+        dob = date(1930, 1, 1) + timedelta(days=rng.randint(0, 30600))
+        patients.append({
+            "id": patient_id,
+            "patient_id": patient_id,
+            "name": f"Patient {patient_id}",
+            "sex": rng.choice(["Male", "Female"]),
+            "dob": dob.isoformat(),
+            "insurance": rng.choice(INSURANCES),
+        })
+    return patients
+
+
+def generate_appointments(n_appointments: int, patients: list, start: date = date(2015, 1, 1), days: int = 3650, seed: int = 0) -> list:
+    # Records follow the API's appointments payload: dates as YYYY-MM-DD, times and durations as HH:MM:SS
+    rng = random.Random(seed)
+    appointments = []
+    for appointment_id in range(1, n_appointments + 1):
+        patient = patients[rng.randrange(len(patients))]
+        appointment_date = start + timedelta(days=rng.randint(0, days))
+        appointment_time = time(rng.randint(8, 17), rng.choice([0, 15, 30, 45]))
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        attended = status == "attended"
+        scheduled_at = datetime.combine(appointment_date, appointment_time)
+        check_in = scheduled_at + timedelta(minutes=rng.randint(-30, 20))
+        waiting = rng.randint(0, 60) * 60
+        duration = rng.randint(5, 60) * 60
+        started = max(check_in, scheduled_at) + timedelta(seconds=waiting)
+        age = appointment_date.year - int(patient["dob"][:4])
+        appointments.append({
+            "id": appointment_id,
+            "appointment_id": appointment_id,
+            "slot_id": appointment_id,
+            "scheduling_date": (appointment_date - timedelta(days=rng.randint(0, 60))).isoformat(),
+            "appointment_date": appointment_date.isoformat(),
+            "appointment_time": appointment_time.strftime("%H:%M:%S"),
+            "scheduling_interval": rng.randint(0, 60),
+            "status": status,
+            "check_in_time": check_in.strftime("%H:%M:%S") if attended else None,
+            "appointment_duration": _hms(duration) if attended else None,
+            "start_time": started.strftime("%H:%M:%S") if attended else None,
+            "end_time": (started + timedelta(seconds=duration)).strftime("%H:%M:%S") if attended else None,
+            "waiting_time": _hms(waiting) if attended else None,
+            "patient_id": patient["patient_id"],
+            "sex": patient["sex"],
+            "age": age,
+            "age_group": f"{age // 10 * 10}-{age // 10 * 10 + 9}",
+        })
+    return appointments
+
+
+def generate_payloads(n_appointments: int, n_patients: int = None, seed: int = 0) -> tuple[bytes, bytes]:
+    n_patients = n_patients or max(1, n_appointments // 10)
+    patients = generate_patients(n_patients, seed)
+    appointments = generate_appointments(n_appointments, patients, seed=seed)
+    return json.dumps(appointments).encode(), json.dumps(patients).encode()
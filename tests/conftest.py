@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The dashboards import the shared modules from DASHBOARDS/ by name
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'DASHBOARDS')))
@@ -0,0 +1,68 @@
+import time
+import api_requests
+from api_requests import ApiClient
+
+
+class Response:
+    def __init__(self, status_code, content=b"", etag=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {"ETag": etag} if etag else {}
+
+    def raise_for_status(self):
+        pass
+
+
+def fake_backend(client, body=b'[{"a": 1}]', etag='"v1"'):
+    requests_seen = []
+
+    def get(url, headers=None, timeout=None):
+        requests_seen.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == etag:
+            return Response(304)
+        return Response(200, body, etag)
+
+    client.session.get = get
+    return requests_seen
+
+
+def test_bodies_stay_on_disk_with_cache_dir(tmp_path):
+    client = ApiClient(cache_dir=str(tmp_path), max_age=0)
+    requests_seen = fake_backend(client)
+
+    assert client.get("http://api/x") == b'[{"a": 1}]'
+    assert client.get("http://api/x") == b'[{"a": 1}]'
+    assert requests_seen[1] == {"If-None-Match": '"v1"'}
+    assert client._bodies == {}
+    assert set(client._cache["http://api/x"]) == {"etag", "fetched_at"}
+
+
+def test_memory_bodies_are_dropped_after_max_age():
+    client = ApiClient(max_age=0.05)
+    requests_seen = fake_backend(client)
+
+    client.get("http://api/x")
+    client.get("http://api/x")
+    assert len(requests_seen) == 1
+
+    time.sleep(0.06)
+    client.get("http://api/y")
+    assert "http://api/x" not in client._bodies
+    client.release("http://api/y")
+    assert client._bodies == {}
+    assert client.fetched_at("http://api/x") is not None
+
+
+def test_shared_client_caches_on_disk_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("DASHBOARD_API_CACHE_DIR", raising=False)
+    monkeypatch.setattr(api_requests.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setattr(api_requests, "_api_client", None)
+    client = api_requests.get_api_client()
+    client.max_age = 0
+    requests_seen = fake_backend(client)
+
+    client.get("http://api/appointments/")
+    client.release("http://api/appointments/")
+    assert client.get("http://api/appointments/") == b'[{"a": 1}]'
+    assert requests_seen[-1] == {"If-None-Match": '"v1"'}
+    assert client.cache_dir == str(tmp_path / "dashboard-api-cache")
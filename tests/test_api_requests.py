@@ -0,0 +1,50 @@
+import json
+import pytest
+from api_requests import PATIENTS_SCHEMA, SchemaDriftError, read_records
+
+PATIENT = {"id": 1, "patient_id": 1, "name": "Patient 1", "sex": "Female", "dob": "1980-01-01", "insurance": "Aetna"}
+
+
+def payload(*records):
+    return json.dumps(list(records)).encode()
+
+
+def test_declared_types():
+    df = read_records(payload(PATIENT, {**PATIENT, "id": 2, "insurance": None}), PATIENTS_SCHEMA)
+    assert df.schema == PATIENTS_SCHEMA
+    assert df["insurance"].to_list() == ["Aetna", None]
+
+
+@pytest.mark.parametrize("later_record", [
+    {**PATIENT, "extra": 1},
+    {key: value for key, value in PATIENT.items() if key != "insurance"},
+    {**{key: value for key, value in PATIENT.items() if key != "sex"}, "gender": "Female"},
+    {**PATIENT, "patient_id": 1.5},
+    {**PATIENT, "patient_id": True},
+    {**PATIENT, "insurance": 5},
+])
+def test_drift_in_any_record_raises(later_record):
+    with pytest.raises(SchemaDriftError):
+        read_records(payload(PATIENT, PATIENT, later_record), PATIENTS_SCHEMA)
+
+
+def test_missing_field_next_to_quoted_keys_in_strings():
+    quoting = {**PATIENT, "name": 'Patient "a": 1'}
+    missing = {key: value for key, value in PATIENT.items() if key != "insurance"}
+    with pytest.raises(SchemaDriftError):
+        read_records(payload(quoting, missing), PATIENTS_SCHEMA)
+
+
+def test_pretty_printed_payload():
+    content = json.dumps([PATIENT, {**PATIENT, "insurance": None}], indent=1, separators=(",", " : ")).encode()
+    assert read_records(content, PATIENTS_SCHEMA)["insurance"].to_list() == ["Aetna", None]
+    with pytest.raises(SchemaDriftError):
+        read_records(content.replace(b'"insurance" : null', b'"name2" : null'), PATIENTS_SCHEMA)
+    with pytest.raises(SchemaDriftError):
+        read_records(content.replace(b',\n  "insurance" : null', b''), PATIENTS_SCHEMA)
+
+
+@pytest.mark.parametrize("content", [b'{"id": 1}', b'null', b'[null]', b'[1, 2]', b'[{"id": 1}'])
+def test_not_an_array_of_records(content):
+    with pytest.raises(SchemaDriftError):
+        read_records(content, PATIENTS_SCHEMA)
@@ -0,0 +1,35 @@
+from datetime import timedelta
+import polars as pl
+from count_cube import CountCube
+
+
+def appointments(n):
+    return pl.DataFrame({
+        "status": ["attended", "cancelled"] * (n // 2),
+        "insurance": ["Aetna"] * n,
+        "age": [i % 80 for i in range(n)],
+        "sex": ["Female", "Male"] * (n // 2),
+        "appointment_duration": [timedelta(minutes=i % 60) if i % 2 == 0 else None for i in range(n)],
+    })
+
+
+def test_cells_do_not_grow_with_the_rows():
+    small, large = CountCube.from_frame(appointments(1_000)), CountCube.from_frame(appointments(10_000))
+
+    assert len(large.counts) == len(small.counts) <= 240
+    assert large.counts.sum() == 10_000
+
+
+def test_band_filters():
+    df = appointments(1_000)
+    counts = CountCube.from_frame(df).count_by(["status"], {"age": (40, 49), "duration_minutes": (40, 49)})
+
+    expected = df.filter(pl.col("age").is_between(40, 49) & pl.col("appointment_duration").dt.total_minutes().is_between(40, 49))
+    assert counts.rows() == [("attended", expected.height)]
+
+
+def test_status_without_durations():
+    counts = CountCube.from_frame(appointments(1_000)).count_by(["duration_minutes", "insurance"], {"status": ["cancelled"]})
+
+    assert counts.schema == {"duration_minutes": pl.Int64, "insurance": pl.String, "count": pl.Int64}
+    assert counts.sort(["duration_minutes", "count"]).rows() == [(None, "Aetna", 500)]
@@ -0,0 +1,14 @@
+import logging
+import pytest
+from deferred_load import DeferredLoad
+
+
+def failing_loader():
+    raise RuntimeError("backend unreachable")
+
+
+def test_background_failure_is_logged(caplog):
+    with caplog.at_level(logging.ERROR, logger="deferred_load"), pytest.raises(RuntimeError):
+        DeferredLoad(failing_loader).start().get(timeout=5)
+
+    assert "backend unreachable" in caplog.records[0].exc_text
@@ -0,0 +1,70 @@
+import json
+from incremental_aggregates import ChangeLogFeed
+
+
+def record(appointment_id, status="attended"):
+    return {
+        "id": appointment_id, "appointment_id": appointment_id, "slot_id": appointment_id,
+        "scheduling_date": "2024-01-01", "appointment_date": "2024-01-10", "appointment_time": "09:00:00",
+        "scheduling_interval": 9, "status": status, "check_in_time": "08:55:00",
+        "appointment_duration": "00:20:00", "start_time": "09:05:00", "end_time": "09:25:00",
+        "waiting_time": "00:10:00", "patient_id": 1, "sex": "Female", "age": 40, "age_group": "40-49",
+    }
+
+
+def write(path, *lines):
+    with open(path, "a") as f:
+        for line in lines:
+            f.write((line if isinstance(line, str) else json.dumps(line)) + "\n")
+
+
+def test_bad_lines_do_not_drop_the_poll(tmp_path):
+    path = tmp_path / "changes.jsonl"
+    write(
+        path,
+        {"op": "update", "record": record(1, "cancelled")},
+        "{not json",
+        {"op": "insert", "record": {**record(2), "appointment_id": 2.5}},
+        {"op": "insert", "record": record(3)},
+        {"op": "delete", "appointment_id": 3},
+        {"op": "delete", "appointment_id": 4},
+    )
+    feed = ChangeLogFeed(str(path))
+
+    upserts, deleted_ids = feed.poll()
+    assert upserts["appointment_id"].to_list() == [1]
+    assert upserts["status"].to_list() == ["cancelled"]
+    assert sorted(deleted_ids) == [3, 4]
+
+    # Everything was consumed, a later poll only sees new lines
+    write(path, {"op": "insert", "record": record(5)})
+    upserts, deleted_ids = feed.poll()
+    assert upserts["appointment_id"].to_list() == [5] and deleted_ids == []
+
+
+def test_api_feed_starts_from_the_snapshot_fetch_time(monkeypatch):
+    import incremental_aggregates
+    from datetime import datetime, timezone
+
+    class Client:
+        def fetched_at(self, url):
+            return datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+    monkeypatch.setattr(incremental_aggregates, "get_api_client", Client)
+    feed = incremental_aggregates.ApiChangeFeed("http://api/appointments/")
+    assert feed.since == datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_api_feed_encodes_updated_since(monkeypatch):
+    import incremental_aggregates
+    from datetime import datetime, timezone
+    from urllib.parse import parse_qs, urlsplit
+
+    requested = []
+    monkeypatch.setattr(incremental_aggregates, "get_appointments_df", lambda url, cache: requested.append(url))
+    feed = incremental_aggregates.ApiChangeFeed(
+        "http://api/appointments/?clinic=1", since=datetime(2024, 1, 1, 12, 0, 5, tzinfo=timezone.utc)
+    )
+    feed.poll()
+
+    assert parse_qs(urlsplit(requested[0]).query) == {"clinic": ["1"], "updated_since": ["2024-01-01T12:00:00+00:00"]}
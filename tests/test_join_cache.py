@@ -0,0 +1,59 @@
+import polars as pl
+import join_cache
+from join_cache import refresh_appointments_patients, scan_appointments_patients
+
+
+def appointments(statuses):
+    return pl.DataFrame({
+        "appointment_id": list(range(1, len(statuses) + 1)),
+        "patient_id": [1, 2, 1][:len(statuses)],
+        "status": statuses,
+    })
+
+
+def patients(insurances):
+    return pl.DataFrame({"patient_id": [1, 2], "insurance": insurances})
+
+
+def read(store_dir):
+    return scan_appointments_patients(store_dir).collect().sort("appointment_id")
+
+
+def test_changed_appointment_is_rejoined(tmp_path):
+    refresh_appointments_patients(appointments(["scheduled", "attended"]), patients(["Aetna", "Cigna"]), tmp_path)
+    refresh_appointments_patients(appointments(["attended", "attended"]), patients(["Aetna", "Cigna"]), tmp_path)
+
+    assert read(tmp_path)["status"].to_list() == ["attended", "attended"]
+
+
+def test_new_removed_and_reinsured(tmp_path):
+    refresh_appointments_patients(appointments(["scheduled", "attended"]), patients(["Aetna", "Cigna"]), tmp_path)
+    refresh_appointments_patients(
+        appointments(["scheduled", "attended", "cancelled"]).filter(pl.col("appointment_id") != 2),
+        patients(["Medicare", "Cigna"]),
+        tmp_path,
+    )
+
+    df = read(tmp_path)
+    assert df["appointment_id"].to_list() == [1, 3]
+    assert df["insurance"].to_list() == ["Medicare", "Medicare"]
+
+
+def test_only_changed_buckets_are_rewritten(tmp_path):
+    refresh_appointments_patients(appointments(["scheduled", "attended"]), patients(["Aetna", "Cigna"]), tmp_path)
+    table_dir = tmp_path / join_cache.APPOINTMENTS_PATIENTS_DIR
+    written = {path.name: path.stat().st_mtime_ns for path in table_dir.glob("bucket-*.parquet")}
+
+    refresh_appointments_patients(appointments(["scheduled", "cancelled"]), patients(["Aetna", "Cigna"]), tmp_path)
+    rewritten = [path.name for path in table_dir.glob("bucket-*.parquet") if path.stat().st_mtime_ns != written[path.name]]
+
+    assert rewritten == ["bucket-02.parquet"]
+    assert read(tmp_path)["status"].to_list() == ["scheduled", "cancelled"]
+
+
+def test_appointments_without_a_patient(tmp_path):
+    df = appointments(["scheduled", "attended"]).with_columns(pl.Series("patient_id", [1, None]))
+    refresh_appointments_patients(df, patients(["Aetna", "Cigna"]), tmp_path)
+    refresh_appointments_patients(df.with_columns(pl.lit("attended").alias("status")), patients(["Aetna", "Cigna"]), tmp_path)
+
+    assert read(tmp_path).select("status", "insurance").rows() == [("attended", "Aetna"), ("attended", None)]
@@ -0,0 +1,54 @@
+import os
+from datetime import date, timedelta
+import polars as pl
+import parquet_store
+from parquet_store import read_partition_stats, scan_appointments, scan_appointments_between, write_appointments
+
+
+def appointments(days, status="attended"):
+    return pl.DataFrame({
+        "appointment_id": list(range(days)),
+        "appointment_date": [date(2024, 1, 1) + timedelta(days=i) for i in range(days)],
+        "status": [status] * days,
+    })
+
+
+def parquet_files(store_dir):
+    return sorted(
+        os.path.relpath(os.path.join(dir_path, name), store_dir)
+        for dir_path, _, names in os.walk(store_dir) for name in names if name.endswith(".parquet")
+    )
+
+
+def test_unchanged_partitions_are_kept(tmp_path):
+    write_appointments(appointments(60), tmp_path)
+    files = parquet_files(tmp_path)
+    write_appointments(appointments(60), tmp_path)
+
+    assert parquet_files(tmp_path) == files
+    assert scan_appointments(tmp_path).collect().height == 60
+
+
+def test_replaced_files_outlive_scans_already_planned(tmp_path, monkeypatch):
+    write_appointments(appointments(60), tmp_path)
+    planned = scan_appointments_between(tmp_path, date(2024, 1, 1), date(2024, 1, 31))
+
+    write_appointments(appointments(31, status="cancelled"), tmp_path)
+    assert planned.collect()["status"].unique().to_list() == ["attended"]
+    assert scan_appointments(tmp_path).collect()["status"].unique().to_list() == ["cancelled"]
+    assert list(read_partition_stats(tmp_path)) == ["year=2024/month=1"]
+
+    # Once the grace period is over the next write removes the unlisted files
+    monkeypatch.setattr(parquet_store, "STALE_FILE_SECONDS", -1)
+    write_appointments(appointments(31, status="cancelled"), tmp_path)
+    assert len(parquet_files(tmp_path)) == 1
+
+
+def test_rows_without_a_date_are_skipped(tmp_path):
+    df = appointments(3).with_columns(
+        pl.when(pl.col("appointment_id") == 1).then(None).otherwise(pl.col("appointment_date")).alias("appointment_date")
+    )
+    write_appointments(df, tmp_path)
+    parquet_store.append_appointments(df, tmp_path)
+
+    assert scan_appointments(tmp_path).collect()["appointment_id"].sort().to_list() == [0, 0, 2, 2]